@@ -0,0 +1,140 @@
+# frontends/console/annotate.py
+
+import argparse
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from tic_tac_toe_ai_player.game.annotation import (
+    COLUMNS,
+    annotate_game,
+    annotation_columns,
+)
+from tic_tac_toe_ai_player.game.records import GameRecord, read_records
+from tic_tac_toe_ai_player.logic.tablebase import Tablebase
+from tic_tac_toe_ai_player.logic.transpositions import TranspositionTable
+
+# Annotation pipeline: replays the games of a game record file (see
+# game/records.py, and the --records option of console.simulate), labels
+# every move with its value and the best value, and saves the columns of
+# the annotations in a .npz file (see COLUMNS in game/annotation.py).
+# The games are read lazily and sent in chunks to a pool of processes. Each
+# process keeps its solver for all its chunks: a transposition table, so a
+# position is only searched the first time the process meets it, or a
+# tablebase, mapped once and shared by all the processes.
+# From the frontends folder:
+# python -m console.annotate games.rec annotations.npz --tablebase tb.bin
+
+# The solver of the worker process, set by init_worker.
+_table: TranspositionTable | None = None
+_tablebase: Tablebase | None = None
+
+
+def init_worker(tablebase_path: Path | None, table_capacity: int) -> None:
+    global _table, _tablebase
+    if tablebase_path is None:
+        _table = TranspositionTable(table_capacity)
+    else:
+        _tablebase = Tablebase(tablebase_path)
+
+
+def annotate_chunk(
+    first_game: int, records: list[GameRecord]
+) -> dict[str, np.ndarray]:
+    # Function that annotates the games of a chunk in a worker process.
+    # Input: the index of the first game of the chunk, and its records
+    # Output: the annotation columns of the chunk
+    annotations = []
+    for game, record in enumerate(records, start=first_game):
+        annotations += annotate_game(record, game, _table, _tablebase)
+    return annotation_columns(annotations)
+
+
+def chunked(
+    records: Iterator[GameRecord], chunk_size: int
+) -> Iterator[tuple[int, list[GameRecord]]]:
+    # Output: the chunks of records, with the index of their first game
+    first_game = 0
+    while chunk := list(islice(records, chunk_size)):
+        yield first_game, chunk
+        first_game += len(chunk)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("records", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--tablebase", type=Path, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--table-capacity", type=int, default=100_000)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results: dict[int, dict[str, np.ndarray]] = {}
+    # The first game and the number of games of each submitted chunk.
+    submitted: dict[Future, tuple[int, int]] = {}
+    games = moves = blunders = 0
+    start = time.perf_counter()
+
+    def collect(future: Future) -> None:
+        nonlocal games, moves, blunders
+        columns = future.result()
+        first_game, chunk_games = submitted.pop(future)
+        results[first_game] = columns
+        games += chunk_games
+        moves += len(columns["game"])
+        blunders += int(columns["blunder"].sum())
+        print(
+            f"{games:>10} games | {moves:>10} moves | "
+            f"{blunders:>10} blunders | "
+            f"{games / (time.perf_counter() - start):10.1f} games/s",
+            flush=True,
+        )
+
+    with ProcessPoolExecutor(
+        args.workers,
+        initializer=init_worker,
+        initargs=(args.tablebase, args.table_capacity),
+    ) as executor:
+        # At most two chunks per process are in flight, so the input is
+        # read as the work progresses instead of all at once.
+        pending: set[Future] = set()
+        for first_game, chunk in chunked(
+            read_records(args.records), args.chunk_size
+        ):
+            if len(pending) >= 2 * args.workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            future = executor.submit(annotate_chunk, first_game, chunk)
+            submitted[future] = (first_game, len(chunk))
+            pending.add(future)
+        for future in wait(pending).done:
+            collect(future)
+
+    ordered = [results[first_game] for first_game in sorted(results)]
+    np.savez(
+        args.output,
+        **{
+            name: np.concatenate([columns[name] for columns in ordered])
+            if ordered else np.empty(0)
+            for name in COLUMNS
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# frontends/console/simulate.py
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import NamedTuple
+
+from tic_tac_toe_ai_player.game.engine import TicTacToe
+from tic_tac_toe_ai_player.game.pacing import NO_PACING
+from tic_tac_toe_ai_player.game.players import ComputerPlayer
+from tic_tac_toe_ai_player.game.records import GameRecord, GameRecordWriter
+from tic_tac_toe_ai_player.game.renderers import NullRenderer
+from tic_tac_toe_ai_player.logic.models import Mark
+
+from .args import PLAYER_CLASSES
+
+# Headless match runner: plays a number of games between two computer
+# players, without rendering and without pacing, spread over a pool of
+# processes. Prints the running counts and the throughput as chunks of
+# games finish. From the frontends folder:
+# python -m console.simulate -X minimax -O random -n 10000
+# With --records PATH, the games are also appended to a game record file
+# (see game/records.py).
+
+COMPUTER_PLAYERS = [
+    name
+    for name, player_class in PLAYER_CLASSES.items()
+    if issubclass(player_class, ComputerPlayer)
+]
+
+
+class Chunk(NamedTuple):
+    # A chunk of games, the unit of work sent to a process of the pool.
+    player_x: str
+    player_o: str
+    starting_mark: Mark
+    games: int
+    seed: int | None
+    index: int
+    keep_records: bool = False
+
+
+class Counts(NamedTuple):
+    x_wins: int = 0
+    o_wins: int = 0
+    ties: int = 0
+
+    def __add__(self, other: "Counts") -> "Counts":
+        return Counts(*(mine + theirs for mine, theirs in zip(self, other)))
+
+    @property
+    def games(self) -> int:
+        return sum(self)
+
+
+class ChunkResult(NamedTuple):
+    counts: Counts
+    records: list[GameRecord]
+
+
+def play_chunk(chunk: Chunk) -> ChunkResult:
+    # Function that plays the games of a chunk in a worker process. Each
+    # chunk reseeds the random module: with a seed, chunk i always plays the
+    # same games; without one, each chunk gets fresh entropy, so that worker
+    # processes forked from the same parent do not replay the same games.
+    # The records of the games are sent back to the main process, which is
+    # the only one writing to the record file.
+    # Input: a Chunk
+    # Output: the Counts of the chunk, and its records if it keeps them
+    if chunk.seed is None:
+        random.seed()
+    else:
+        random.seed(f"{chunk.seed}-{chunk.index}")
+    player1 = PLAYER_CLASSES[chunk.player_x](Mark("X"))
+    player2 = PLAYER_CLASSES[chunk.player_o](Mark("O"))
+    records: list[GameRecord] = []
+    game = TicTacToe(
+        player1,
+        player2,
+        NullRenderer(),
+        record_handler=records.append if chunk.keep_records else None,
+        pacing=NO_PACING,
+    )
+    counts = Counts()
+    for _ in range(chunk.games):
+        winner = game.play(chunk.starting_mark).winner
+        counts += Counts(winner == "X", winner == "O", winner is None)
+    return ChunkResult(counts, records)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-X", dest="player_x", choices=COMPUTER_PLAYERS, default="minimax"
+    )
+    parser.add_argument(
+        "-O", dest="player_o", choices=COMPUTER_PLAYERS, default="random"
+    )
+    parser.add_argument(
+        "--starting",
+        dest="starting_mark",
+        choices=Mark,
+        type=Mark,
+        default="X",
+    )
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--records", type=Path, default=None)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    chunks = [
+        Chunk(
+            args.player_x,
+            args.player_o,
+            args.starting_mark,
+            min(args.chunk_size, args.games - start),
+            args.seed,
+            index,
+            args.records is not None,
+        )
+        for index, start in enumerate(range(0, args.games, args.chunk_size))
+    ]
+    print(f"X: {args.player_x}, O: {args.player_o}, "
+          f"{args.starting_mark} starts, {args.workers} workers")
+    total = Counts()
+    writer = GameRecordWriter(args.records) if args.records else None
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [executor.submit(play_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            counts, records = future.result()
+            total += counts
+            if writer is not None:
+                for record in records:
+                    writer.write(record)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{total.games:>9} games | X wins {total.x_wins:>9} | "
+                f"O wins {total.o_wins:>9} | ties {total.ties:>9} | "
+                f"{total.games / elapsed:10.1f} games/s",
+                flush=True,
+            )
+    if writer is not None:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
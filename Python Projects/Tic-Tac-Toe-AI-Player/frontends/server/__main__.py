@@ -0,0 +1,5 @@
+# frontends/server/__main__.py
+
+from .server import main
+
+main()
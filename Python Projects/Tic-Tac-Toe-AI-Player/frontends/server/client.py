@@ -0,0 +1,131 @@
+# frontends/server/client.py
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from .server import percentiles
+
+# Load-testing client for the game server. Opens a number of connections
+# and plays many sessions at the same time over each of them, with random
+# moves. Prints the client-side latency percentiles of the move requests,
+# the number of games per second, and the statistics of the server.
+# From the frontends folder, with the server running:
+# python -m server.client --sessions 5000 --connections 50
+
+
+class Connection:
+    # A connection to the server, shared by many sessions. A reader task
+    # sends every message from the server to the queue of its session.
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.queues: dict[str | None, asyncio.Queue] = {None: asyncio.Queue()}
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> "Connection":
+        reader, writer = await asyncio.open_connection(host, port, limit=2**20)
+        connection = cls(reader, writer)
+        connection.reader_task = asyncio.create_task(connection.read())
+        return connection
+
+    async def read(self) -> None:
+        while line := await self.reader.readline():
+            message = json.loads(line)
+            await self.queues[message.get("session")].put(message)
+
+    async def send(self, message: dict) -> None:
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        self.reader_task.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_session(
+    connection: Connection, name: str, latencies: list[float]
+) -> str:
+    # Function that plays one game against the server with random moves.
+    # Input: the connection, the name of the session, and the list where
+    # the latencies of the move requests are added
+    # Output: the result of the game for the client: win, loss or tie
+    mark = random.choice("XO")
+    queue = connection.queues[name] = asyncio.Queue()
+    await connection.send({
+        "type": "new",
+        "session": name,
+        "mark": mark,
+        "starting": random.choice("XO"),
+    })
+    sent_at = None
+    while True:
+        message = await queue.get()
+        if message["type"] != "state":
+            raise RuntimeError(message["message"])
+        if message["over"]:
+            break
+        if message["current"] != mark:
+            continue
+        if sent_at is not None:
+            latencies.append(time.perf_counter() - sent_at)
+        empty_cells = [
+            index for index, cell in enumerate(message["cells"]) if cell == " "
+        ]
+        sent_at = time.perf_counter()
+        await connection.send({
+            "type": "move", "session": name, "cell": random.choice(empty_cells)
+        })
+    if sent_at is not None:
+        latencies.append(time.perf_counter() - sent_at)
+    del connection.queues[name]
+    if message["winner"] is None:
+        return "tie"
+    return "win" if message["winner"] == mark else "loss"
+
+
+async def run(host: str, port: int, sessions: int, connections: int) -> None:
+    opened = [
+        await Connection.open(host, port) for _ in range(connections)
+    ]
+    latencies: list[float] = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        play_session(opened[index % connections], f"s{index}", latencies)
+        for index in range(sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    await opened[0].send({"type": "stats"})
+    server_stats = await opened[0].queues[None].get()
+    for connection in opened:
+        await connection.close()
+
+    print(f"{sessions} games in {elapsed:.2f} s, "
+          f"{sessions / elapsed:.1f} games/s")
+    print(f"client results: {results.count('win')} wins, "
+          f"{results.count('loss')} losses, {results.count('tie')} ties")
+    print("client latency (ms): " + ", ".join(
+        f"{name} {value * 1000:.2f}"
+        for name, value in percentiles(latencies).items()
+    ))
+    print("server: " + json.dumps(server_stats))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.sessions, args.connections))
+
+
+if __name__ == "__main__":
+    main()
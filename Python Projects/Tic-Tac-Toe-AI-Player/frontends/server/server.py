@@ -0,0 +1,341 @@
+# frontends/server/server.py
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterable
+
+from tic_tac_toe_ai_player.game.engine import TicTacToe
+from tic_tac_toe_ai_player.game.metrics import MetricsObserver
+from tic_tac_toe_ai_player.game.pacing import NO_PACING
+from tic_tac_toe_ai_player.game.players import MinimaxComputerPlayer, Player
+from tic_tac_toe_ai_player.game.renderers import Renderer
+from tic_tac_toe_ai_player.logic.exceptions import InvalidMove
+from tic_tac_toe_ai_player.logic.models import GameState, Mark, Move
+from tic_tac_toe_ai_player.logic.tablebase import Tablebase
+from tic_tac_toe_ai_player.logic.transpositions import shared_table
+
+# A game server: hosts many independent games at the same time, in a single
+# asyncio event loop, for clients connected over TCP. Every session is a
+# TicTacToe game between the client (a RemotePlayer) and a
+# MinimaxComputerPlayer. All the computer players share the process-wide
+# transposition table, or a tablebase if one is given, so a position solved
+# for one session is free for all the others. With --move-time, every move
+# of the computer players is searched within that many seconds. With
+# --metrics PATH, the metrics of the games (see game/metrics.py) are written
+# to PATH at every report, in JSON if PATH ends with .json and in the
+# Prometheus text format otherwise.
+# From the frontends folder: python -m server --port 8765
+#
+# Protocol: one JSON object per line, in both directions.
+# Client to server:
+#   {"type": "new", "session": "a1", "mark": "X", "starting": "X"}
+#   {"type": "move", "session": "a1", "cell": 4}
+#   {"type": "stats"}
+# Server to client:
+#   {"type": "state", "session": "a1", "cells": "    X    ", "code": 81,
+#    "current": "O", "winner": null, "tie": false, "over": false}
+#   {"type": "error", "session": "a1", "message": "Cell is not empty"}
+#   {"type": "stats", "sessions": 12, "requests": 345, "p50_ms": ...}
+# "code" is the position code of the state (see GameState.to_code), for
+# clients that cache or log positions. Session names are chosen by the
+# client and only need to be unique on its connection. The latency of a
+# move request is the time from its arrival to the state sent back once it
+# is the client's turn again (or the game is over), so it includes the
+# computer player's move.
+
+
+def percentiles(
+    values: Iterable[float], ranks: Iterable[int] = (50, 90, 95, 99)
+) -> dict[str, float]:
+    # Function that computes percentiles with the nearest-rank method.
+    # Input: the values and the percentile ranks to compute
+    # Output: a dictionary like {"p50": ..., "p99": ...}, empty if there is
+    # no value
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {
+        f"p{rank}": ordered[min(len(ordered) - 1, len(ordered) * rank // 100)]
+        for rank in ranks
+    }
+
+
+class LatencyRecorder:
+    # Keeps the latencies of the last max_samples requests.
+    def __init__(self, max_samples: int = 100_000) -> None:
+        self.samples: deque[float] = deque(maxlen=max_samples)
+        self.requests = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.requests += 1
+
+    def report(self) -> dict[str, float]:
+        # Output: the number of requests and the latency percentiles, in
+        # milliseconds
+        report = {"requests": self.requests}
+        for name, value in percentiles(self.samples).items():
+            report[f"{name}_ms"] = round(value * 1000, 3)
+        return report
+
+
+class RemotePlayer(Player):
+    # The player on the other end of the connection. Its moves arrive from
+    # the network: the server puts the requested cells in a queue, and the
+    # player waits for them without blocking the event loop.
+    def __init__(self, mark: Mark) -> None:
+        super().__init__(mark)
+        self.moves: asyncio.Queue[tuple[int, float]] = asyncio.Queue()
+        self.request_time: float | None = None
+
+    def get_move(self, game_state: GameState) -> Move | None:
+        # The moves arrive in an asyncio queue, which can only be waited on
+        # from the event loop, so a remote player cannot answer the
+        # blocking get_move. The server only plays its games with
+        # TicTacToe.play_async, which calls get_move_async; play and steps
+        # get this error instead of a deadlock.
+        raise RuntimeError(
+            "Remote players can only play in TicTacToe.play_async"
+        )
+
+    async def get_move_async(self, game_state: GameState) -> Move | None:
+        cell, self.request_time = await self.moves.get()
+        return game_state.make_move_to(cell)
+
+
+class SessionRenderer(Renderer):
+    # "Renders" a game by sending each new state to the client, and records
+    # the latency of the pending move request once the client can play
+    # again.
+    def __init__(
+        self,
+        name: str,
+        player: RemotePlayer,
+        writer: asyncio.StreamWriter,
+        latencies: LatencyRecorder,
+    ) -> None:
+        self.name = name
+        self.player = player
+        self.writer = writer
+        self.latencies = latencies
+
+    def render(self, game_state: GameState) -> None:
+        send(self.writer, state_message(self.name, game_state))
+        client_turn = game_state.current_mark is self.player.mark
+        if self.player.request_time is not None and (
+            client_turn or game_state.game_over
+        ):
+            self.latencies.record(
+                time.perf_counter() - self.player.request_time
+            )
+            self.player.request_time = None
+
+
+def state_message(name: str, game_state: GameState) -> dict:
+    return {
+        "type": "state",
+        "session": name,
+        "cells": game_state.grid.cells,
+        "code": game_state.to_code(),
+        "current": game_state.current_mark,
+        "winner": game_state.winner,
+        "tie": game_state.tie,
+        "over": game_state.game_over,
+    }
+
+
+def send(writer: asyncio.StreamWriter, message: dict) -> None:
+    writer.write(json.dumps(message).encode() + b"\n")
+
+
+class GameServer:
+    # The state of the server: the open sessions of every connection, the
+    # shared solver and the latency statistics.
+    def __init__(
+        self,
+        tablebase: Tablebase | None = None,
+        move_time: float | None = None,
+    ) -> None:
+        self.tablebase = tablebase
+        self.move_time = move_time
+        self.table = shared_table()
+        self.latencies = LatencyRecorder()
+        self.metrics = MetricsObserver()
+        self.sessions: dict[tuple[int, str], RemotePlayer] = {}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        # Function that serves one client connection until it closes.
+        connection = id(writer)
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    task = self.handle_message(connection, message, writer)
+                except (ValueError, KeyError, TypeError) as ex:
+                    send(writer, {"type": "error", "message": str(ex)})
+                    continue
+                if task is not None:
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                await writer.drain()
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    def handle_message(
+        self, connection: int, message: dict, writer: asyncio.StreamWriter
+    ) -> asyncio.Task | None:
+        # Function that handles one request. Starting a session returns the
+        # task that plays its game.
+        if not isinstance(message, dict):
+            raise ValueError("Messages must be JSON objects")
+        name = message.get("session")
+        if message["type"] == "new":
+            if (connection, name) in self.sessions:
+                raise ValueError(f"Session {name} already exists")
+            starting_mark = Mark(message.get("starting", "X"))
+            game = self.new_game(name, message, writer)
+            self.sessions[(connection, name)] = game.player1
+            return asyncio.create_task(
+                self.play_session(connection, name, game, starting_mark)
+            )
+        if message["type"] == "move":
+            if (connection, name) not in self.sessions:
+                raise ValueError(f"Unknown session {name}")
+            cell = int(message["cell"])
+            if not 0 <= cell < 9:
+                raise ValueError("Cell must be between 0 and 8")
+            self.sessions[(connection, name)].moves.put_nowait(
+                (cell, time.perf_counter())
+            )
+            return None
+        if message["type"] == "stats":
+            send(writer, self.stats_message())
+            return None
+        raise ValueError(f"Unknown message type {message['type']}")
+
+    def new_game(
+        self, name: str, message: dict, writer: asyncio.StreamWriter
+    ) -> TicTacToe:
+        # Function that creates the game of a new session, between the
+        # client (player1) and a computer player using the shared solver.
+        mark = Mark(message.get("mark", "X"))
+        remote = RemotePlayer(mark)
+        computer = MinimaxComputerPlayer(
+            mark.other,
+            table=self.table,
+            tablebase=self.tablebase,
+            move_time=self.move_time,
+        )
+
+        def report_error(ex: Exception) -> None:
+            send(
+                writer,
+                {"type": "error", "session": name, "message": str(ex)},
+            )
+
+        return TicTacToe(
+            remote,
+            computer,
+            SessionRenderer(name, remote, writer, self.latencies),
+            report_error,
+            pacing=NO_PACING,
+            observers=(self.metrics,),
+        )
+
+    async def play_session(
+        self,
+        connection: int,
+        name: str,
+        game: TicTacToe,
+        starting_mark: Mark,
+    ) -> None:
+        # Function that plays the game of a session, from its creation to
+        # its end.
+        try:
+            await game.play_async(starting_mark)
+        except InvalidMove as ex:
+            game.error_handler(ex)
+        finally:
+            del self.sessions[(connection, name)]
+
+    def stats_message(self) -> dict:
+        return {
+            "type": "stats",
+            "sessions": len(self.sessions),
+            **self.latencies.report(),
+            "cache_hits": self.table.hits,
+            "cache_misses": self.table.misses,
+        }
+
+    async def report_periodically(
+        self, seconds: float, metrics_path: Path | None = None
+    ) -> None:
+        while True:
+            await asyncio.sleep(seconds)
+            print(json.dumps(self.stats_message()), flush=True)
+            if metrics_path is None:
+                continue
+            if metrics_path.suffix == ".json":
+                self.metrics.write_json(metrics_path)
+            else:
+                self.metrics.write_prometheus(metrics_path)
+
+
+async def serve(
+    host: str,
+    port: int,
+    tablebase: Tablebase | None,
+    report_every: float,
+    move_time: float | None = None,
+    metrics_path: Path | None = None,
+) -> None:
+    game_server = GameServer(tablebase, move_time)
+    server = await asyncio.start_server(
+        game_server.handle_connection, host, port, limit=2**20
+    )
+    print(f"Serving on {host}:{port}", flush=True)
+    reporter = None
+    if report_every > 0:
+        reporter = asyncio.create_task(
+            game_server.report_periodically(report_every, metrics_path)
+        )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tablebase", type=Path, default=None)
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--move-time", type=float, default=None)
+    parser.add_argument("--metrics", type=Path, default=None)
+    args = parser.parse_args()
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+    try:
+        asyncio.run(
+            serve(
+                args.host,
+                args.port,
+                tablebase,
+                args.report_every,
+                args.move_time,
+                args.metrics,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,93 @@
+# benchmarks/bench_memory.py
+
+import argparse
+import gc
+import resource
+import subprocess
+import sys
+import time
+
+from tic_tac_toe_ai_player.logic.models import (
+    GameState,
+    Grid,
+    RetentionPolicy,
+    set_intern_pools,
+    set_retention_policy,
+)
+
+
+# This script measures the memory kept by a walk of the whole game tree
+# through the immutable model (possible_moves and after_state) under each
+# retention setting (see RetentionPolicy in models.py). The searches of
+# minimax.py work on a SearchBoard below the root and build no states, so
+# the walk stands for the code that visits the states themselves.
+# Settings:
+# - retain: the default, states cache their moves and pools are strong
+# - discard: states do not cache their moves, pools are still strong
+# - discard-weak: states do not cache their moves, and pools are weak
+# The peak RSS of a process never goes down, so every setting runs in its
+# own process. Each run prints the growth of the peak RSS during the
+# walk, the number of states still pooled after it (the root is still
+# referenced), and the duration of the walk.
+
+MODES = ("retain", "discard", "discard-weak")
+
+
+def peak_rss_kib() -> int:
+    # Output: the peak resident set size of the process, in KiB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def count_games(game_state: GameState) -> int:
+    # Function that walks the tree below a state.
+    # Input: a game state
+    # Output: the number of games that can be played from it
+    if game_state.game_over:
+        return 1
+    return sum(
+        count_games(move.after_state) for move in game_state.possible_moves
+    )
+
+
+def run(mode: str, cells: str) -> None:
+    # Function that runs one walk under a mode, in the current process.
+    # Input: the mode and the cells of the position
+    # Output: None, prints a line of results
+    if mode != "retain":
+        set_retention_policy(RetentionPolicy.DISCARD)
+    if mode == "discard-weak":
+        set_intern_pools(weak=True)
+    game_state = GameState(Grid(cells))
+    gc.collect()
+    before = peak_rss_kib()
+    start = time.perf_counter()
+    count_games(game_state)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    print(
+        f"{mode:<14}{peak_rss_kib() - before:>10} KiB"
+        f"{len(GameState.pool):>10} states{elapsed * 1000:>10.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cells", default=" " * 9)
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.cells)
+        return
+    print(f"position: {args.cells!r}")
+    print(f"{'mode':<14}{'peak RSS +':>14}{'pooled':>17}{'time':>13}")
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, __file__, "--run", mode, "--cells", args.cells],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_nodes.py
+
+import argparse
+import sys
+import tracemalloc
+from typing import Callable
+
+from tic_tac_toe_ai_player.logic.models import (
+    GameState,
+    Grid,
+    Mark,
+    Move,
+    clear_interned,
+)
+
+
+# This script measures the memory taken by each node of the game tree:
+# Grid, GameState and Move objects. The classes use __slots__, with memo
+# fields for the values the searches read (bitboards, counts, winner...).
+# They are compared to the previous layout, where the same values were
+# cached by functools.cached_property in a per-instance __dict__.
+# Every reachable state is built once, then copied into both layouts from
+# the same values (strings and integers are shared), so only the objects
+# themselves are counted, as allocated bytes per object from tracemalloc.
+# The memo fields of the moves (_possible_moves, _after_state) are left
+# empty, like in a fresh node.
+
+
+def reachable_states(starting_mark: Mark) -> list[GameState]:
+    # Function that lists every state reachable from the empty grid.
+    # Input: the starting Mark
+    # Output: the states, in breadth-first order
+    root = GameState(Grid(), starting_mark)
+    states = [root]
+    seen = {root}
+    for game_state in states:
+        for move in game_state.possible_moves:
+            if move.after_state not in seen:
+                seen.add(move.after_state)
+                states.append(move.after_state)
+    return states
+
+
+def copiers(cls: type) -> tuple[Callable, Callable]:
+    # Function that builds the functions copying a node of a class into
+    # each layout. The names of the slots are read once, so the copies do
+    # not allocate anything but the new objects. The memo fields are in the
+    # slots of the base classes (see _GridMemo), not in the dataclass
+    # fields, so every class of the MRO is read.
+    # Input: Grid, GameState or Move
+    # Output: the copy function of the slotted layout, and the one of the
+    # dict layout
+    slots = [
+        name for klass in cls.__mro__
+        for name in getattr(klass, "__slots__", ())
+        if name != "__weakref__"
+    ]
+    names = [name for name in slots if not name.startswith("_")]
+    memo_names = [name for name in slots if name.startswith("_")]
+    # objects that keep their attributes in a __dict__, like the frozen
+    # dataclasses with cached properties did. Each class gets its own, so
+    # its instances share the keys of their dicts like the originals did.
+    dict_layout = type(f"Dict{cls.__name__}", (), {})
+
+    def slotted_copy(node: object) -> object:
+        copy = object.__new__(cls)
+        for name in names:
+            object.__setattr__(copy, name, getattr(node, name))
+        for name in memo_names:
+            object.__setattr__(copy, name, None)
+        return copy
+
+    def dict_copy(node: object) -> object:
+        # the previous layout had no entry for the moves in a fresh node
+        copy = dict_layout()
+        for name in names:
+            setattr(copy, name, getattr(node, name))
+        return copy
+
+    return slotted_copy, dict_copy
+
+
+def allocated_per_node(nodes: list[object], copy) -> tuple[float, list]:
+    # Function that copies nodes while tracing the allocations.
+    # Input: the nodes, and the function that copies one
+    # Output: the bytes allocated per copy, and the copies (kept alive until
+    # the measure is taken)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copies = [copy(node) for node in nodes]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding the copies is not part of the nodes
+    overhead = sys.getsizeof(copies)
+    return (after - before - overhead) / len(nodes), copies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--starting-mark", choices=("X", "O"), default="X"
+    )
+    args = parser.parse_args()
+
+    clear_interned()
+    states = reachable_states(Mark(args.starting_mark))
+    nodes: dict[type, list[object]] = {
+        Grid: [game_state.grid for game_state in states],
+        GameState: states,
+        Move: [move for state in states for move in state.possible_moves],
+    }
+    print(f"{len(states)} states, {len(nodes[Move])} moves")
+    print(f"{'class':<12}{'slots':>10}{'dict':>10}{'saved':>8}")
+    for cls, objects in nodes.items():
+        slotted_copy, dict_copy = copiers(cls)
+        slotted, _ = allocated_per_node(objects, slotted_copy)
+        in_dict, _ = allocated_per_node(objects, dict_copy)
+        print(
+            f"{cls.__name__:<12}{slotted:>8.0f} B{in_dict:>8.0f} B"
+            f"{1 - slotted / in_dict:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
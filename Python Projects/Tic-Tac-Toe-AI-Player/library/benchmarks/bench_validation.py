@@ -0,0 +1,81 @@
+# benchmarks/bench_validation.py
+
+import argparse
+import gc
+import time
+
+from tic_tac_toe_ai_player.logic.models import GameState, Grid, clear_interned
+from tic_tac_toe_ai_player.logic.validators import (
+    ValidationPolicy,
+    set_validation_policy,
+)
+
+
+# This script measures what the validators cost when the states of the
+# game tree are built through the immutable model (the searches of
+# minimax.py work on a SearchBoard, and build no states below the root).
+# The validation policy only changes how a state is built the first time:
+# once a state is interned, later moves to it get the pooled instance under
+# both policies. So the script builds every state reachable from a position
+# once, breadth first, from cleared pools, and prints the best time of each
+# policy. With --no-interning, the pools are disabled, and every move
+# builds (and, under the FULL policy, validates) its own state.
+
+
+def build_states(game_state: GameState) -> int:
+    # Function that builds every state reachable from a state, once each.
+    # Input: a game state
+    # Output: the number of states
+    states = [game_state]
+    seen = {game_state}
+    for state in states:
+        for move in state.iter_moves():
+            if move.after_state not in seen:
+                seen.add(move.after_state)
+                states.append(move.after_state)
+    return len(states)
+
+
+def time_build(cells: str, repeat: int) -> dict[ValidationPolicy, float]:
+    # Function that times the building of the states reachable from a
+    # position under each policy. The policies take turns, so a slowdown of
+    # the machine during the runs affects both, and the garbage collector
+    # is off while a run is timed, like in timeit.
+    # Input: the cells of the position and the number of runs
+    # Output: the best time in seconds of each policy
+    best = {policy: float("inf") for policy in ValidationPolicy}
+    for _ in range(repeat):
+        for policy in ValidationPolicy:
+            set_validation_policy(policy)
+            clear_interned()
+            game_state = GameState(Grid(cells))
+            gc.disable()
+            start = time.perf_counter()
+            build_states(game_state)
+            elapsed = time.perf_counter() - start
+            gc.enable()
+            best[policy] = min(best[policy], elapsed)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cells", default=" " * 9)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-interning", action="store_true")
+    args = parser.parse_args()
+
+    if args.no_interning:
+        Grid.pool.maxsize = GameState.pool.maxsize = 0
+
+    best = time_build(args.cells, args.repeat)
+    full = best[ValidationPolicy.FULL]
+    trusted = best[ValidationPolicy.TRUSTED]
+    print(f"position: {args.cells!r}")
+    print(f"full validation:   {full * 1000:9.1f} ms")
+    print(f"trusted path:      {trusted * 1000:9.1f} ms")
+    print(f"saving:            {(1 - trusted / full) * 100:9.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# tic_tac_toe/game/annotation.py
+
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+from tic_tac_toe_ai_player.game.records import GameRecord
+from tic_tac_toe_ai_player.logic.minimax import alphabeta
+from tic_tac_toe_ai_player.logic.models import GameState, Mark
+from tic_tac_toe_ai_player.logic.tablebase import Tablebase
+from tic_tac_toe_ai_player.logic.transpositions import TranspositionTable
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Annotation of recorded games: every move is labelled with its value (the
+# score the player gets after it, with perfect play from both sides) and the
+# best value they could have got. A move worth less than the best one is a
+# blunder: it turns a win into a tie or a loss, or a tie into a loss.
+# Scores are 1, 0 or -1 for the player who moves, like in minimax.py.
+
+COLUMNS = ("game", "ply", "mark", "cell", "value", "best_value", "blunder")
+
+
+class MoveAnnotation(NamedTuple):
+    # A move of a recorded game and what the solver thinks of it.
+    # game: the index of the game in its record file
+    # ply: the index of the move in the game, from 0
+    game: int
+    ply: int
+    mark: Mark
+    cell_index: int
+    value: int
+    best_value: int
+
+    @property
+    def blunder(self) -> bool:
+        return self.value < self.best_value
+
+
+def state_score(
+    game_state: GameState,
+    table: TranspositionTable | None = None,
+    tablebase: Tablebase | None = None,
+) -> int:
+    # Function that solves a state, with a tablebase lookup if there is one
+    # and an alpha-beta search otherwise. With a transposition table, the
+    # search of a state already solved by an earlier game is a single
+    # lookup.
+    # Input: a game state, an optional TranspositionTable and an optional
+    # Tablebase
+    # Output: the score of the state for its current player
+    if tablebase is not None:
+        entry = tablebase.lookup(game_state)
+        if entry is not None:
+            return entry.score
+    return alphabeta(game_state, table=table)
+
+
+def annotate_game(
+    record: GameRecord,
+    game: int = 0,
+    table: TranspositionTable | None = None,
+    tablebase: Tablebase | None = None,
+) -> list[MoveAnnotation]:
+    # Function that replays a recorded game and annotates each of its
+    # moves. The score of every state is computed once: the best value of a
+    # move is the score of the state before it, and its value is the
+    # opposite of the score of the state after it (the other player moves
+    # there).
+    # Input: a GameRecord, its index, and the solver options of state_score
+    # Output: the MoveAnnotations of the game, in order
+    states = list(record.states())
+    scores = [state_score(state, table, tablebase) for state in states]
+    return [
+        MoveAnnotation(
+            game,
+            ply,
+            states[ply].current_mark,
+            cell_index,
+            -scores[ply + 1],
+            scores[ply],
+        )
+        for ply, cell_index in enumerate(record.moves)
+    ]
+
+
+def annotation_columns(
+    annotations: Iterable[MoveAnnotation],
+) -> dict[str, "np.ndarray"]:
+    # Function that turns annotations into columns, one array per field
+    # (see COLUMNS), ready to be saved with numpy.savez. Marks are stored as
+    # in logic/batch.py: 1 for X and 2 for O.
+    # Input: annotations
+    # Output: a dictionary from column name to array
+    import numpy as np
+
+    rows = [
+        (
+            annotation.game,
+            annotation.ply,
+            1 if annotation.mark == Mark.CROSS else 2,
+            annotation.cell_index,
+            annotation.value,
+            annotation.best_value,
+        )
+        for annotation in annotations
+    ]
+    values = np.array(rows, dtype=np.int64).reshape(-1, 6)
+    columns = {"game": values[:, 0]}
+    for index, name in enumerate(COLUMNS[1:6], start=1):
+        columns[name] = values[:, index].astype(np.int8)
+    columns["blunder"] = columns["value"] < columns["best_value"]
+    return columns
@@ -0,0 +1,42 @@
+# tic_tac_toe/game/clock.py
+
+from dataclasses import dataclass, field
+
+from tic_tac_toe_ai_player.logic.models import GameState
+
+
+@dataclass
+class GameClock:
+    # The thinking time of a player for a whole game, like a chess clock.
+    # Each move gets an equal share of the time left for the moves the
+    # player still has to play, capped by move_limit if there is one, and
+    # the time it really took is then charged to the clock.
+    # total: the seconds available for all the moves of one game
+    # move_limit: the most seconds a single move can take
+    total: float
+    move_limit: float | None = None
+    remaining: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.total <= 0:
+            raise ValueError("The time of the clock must be positive")
+        if self.move_limit is not None and self.move_limit <= 0:
+            raise ValueError("The time limit of a move must be positive")
+        self.remaining = self.total
+
+    def reset(self) -> None:
+        # Function that gives the clock its full time back, for a new game.
+        self.remaining = self.total
+
+    def budget(self, game_state: GameState) -> float:
+        # Input: the state in which the player has to move
+        # Output: the seconds the player can spend on this move
+        moves_left = (game_state.grid.empty_count + 1) // 2
+        share = self.remaining / max(1, moves_left)
+        if self.move_limit is not None:
+            share = min(share, self.move_limit)
+        return share
+
+    def charge(self, seconds: float) -> None:
+        # Function that takes the time of a move from the clock.
+        self.remaining = max(0.0, self.remaining - seconds)
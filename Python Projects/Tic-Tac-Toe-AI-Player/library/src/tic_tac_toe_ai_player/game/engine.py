@@ -1,14 +1,50 @@
 # tic_tac_toe/game/engine.py
 
-from dataclasses import dataclass
-from typing import Callable, TypeAlias
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Generator, NamedTuple, TypeAlias
+from tic_tac_toe_ai_player.game.observers import GameObserver
+from tic_tac_toe_ai_player.game.pacing import Pacing, paced
 from tic_tac_toe_ai_player.game.players import Player
+from tic_tac_toe_ai_player.game.records import GameRecord
 from tic_tac_toe_ai_player.game.renderers import Renderer
 from tic_tac_toe_ai_player.logic.exceptions import InvalidMove
-from tic_tac_toe_ai_player.logic.models import GameState, Grid, Mark
+from tic_tac_toe_ai_player.logic.minimax import SearchStats
+from tic_tac_toe_ai_player.logic.models import GameState, Grid, Mark, Move
 from tic_tac_toe_ai_player.logic.validators import validate_players
 
 ErrorHandler: TypeAlias = Callable[[Exception], None]
+RecordHandler: TypeAlias = Callable[[GameRecord], None]
+
+
+@dataclass
+class GameStats:
+    # The search statistics of a game: the SearchStats of each player's
+    # decisions added up, and the number of decisions, by mark. Players
+    # that do not search (see Player.last_stats) are left out.
+    searches: dict[Mark, SearchStats] = field(default_factory=dict)
+    decisions: dict[Mark, int] = field(default_factory=dict)
+
+    def add(self, mark: Mark, stats: SearchStats) -> None:
+        # Function that adds the stats of a decision of a player.
+        self.searches.setdefault(mark, SearchStats()).add(stats)
+        self.decisions[mark] = self.decisions.get(mark, 0) + 1
+
+
+StatsHandler: TypeAlias = Callable[[GameStats], None]
+
+# The numbers given to the games for the observers.
+_game_ids = itertools.count()
+
+
+class Step(NamedTuple):
+    # A turn of a game, as yielded by TicTacToe.steps: the state before the
+    # move, the player whose turn it is, and the move they played (None
+    # while the move has not been decided yet).
+    state: GameState
+    player: Player
+    move: Move | None
 
 
 @dataclass(frozen=True)
@@ -18,26 +54,209 @@ class TicTacToe:
     player2: Player
     renderer: Renderer
     error_handler: ErrorHandler | None = None
+    record_handler: RecordHandler | None = None
+    # The pacing of the computer players in this game, for example NO_PACING
+    # for simulations. None keeps the pacing of each player.
+    pacing: Pacing | None = None
+    # Called at the end of each game with its GameStats.
+    stats_handler: StatsHandler | None = None
+    # Notified of every step of the games (see game/observers.py).
+    observers: tuple[GameObserver, ...] = ()
 
     def __post_init__(self):
         validate_players(self.player1, self.player2)
 
-    def play(self, starting_mark: Mark = Mark("X")) -> None:
+    def play(self, starting_mark: Mark = Mark("X")) -> GameState:
         # Function that instantiate a game of tic tac toe.
         # Creates a blank game state, and instanciates a loop that, as long as
         # the game is not over, renders the "board", finds which player has to
         # play, and allows them to make their move.
+        # Returns the final state of the game, to know who won.
         game_state = GameState(Grid(), starting_mark)
+        moves: list[int] = []
+        game_stats = GameStats()
+        game_id = next(_game_ids)
+        game_started = self.notify("on_game_start", game_id, game_state)
         while True:
             self.renderer.render(game_state)
             if game_state.game_over:
-                break
+                self.record(starting_mark, moves, game_stats)
+                self.notify("on_game_end", game_id, game_state, game_started)
+                return game_state
             player = self.get_current_player(game_state)
+            move_started = self.notify(
+                "on_before_move", game_id, game_state, player
+            )
             try:
-                game_state = player.make_move(game_state)
+                with paced(self.pacing):
+                    next_state = player.make_move(game_state)
+                moves.append(played_cell(game_state, next_state))
+                collect_stats(game_stats, player)
+                self.notify(
+                    "on_after_move",
+                    game_id,
+                    game_state,
+                    player,
+                    next_state,
+                    move_started,
+                )
+                game_state = next_state
             except InvalidMove as ex:
                 if self.error_handler:
                     self.error_handler(ex)
+                self.notify(
+                    "on_invalid_move",
+                    game_id,
+                    game_state,
+                    player,
+                    ex,
+                    move_started,
+                )
+
+    async def play_async(self, starting_mark: Mark = Mark("X")) -> GameState:
+        # Asynchronous version of play, for an event loop that runs many
+        # games at the same time. The loop is the same, but the players'
+        # moves are awaited (see Player.make_move_async), so a game waiting
+        # for a player lets the other games progress.
+        game_state = GameState(Grid(), starting_mark)
+        moves: list[int] = []
+        game_stats = GameStats()
+        game_id = next(_game_ids)
+        game_started = self.notify("on_game_start", game_id, game_state)
+        while True:
+            self.renderer.render(game_state)
+            if game_state.game_over:
+                self.record(starting_mark, moves, game_stats)
+                self.notify("on_game_end", game_id, game_state, game_started)
+                return game_state
+            player = self.get_current_player(game_state)
+            move_started = self.notify(
+                "on_before_move", game_id, game_state, player
+            )
+            try:
+                with paced(self.pacing):
+                    next_state = await player.make_move_async(game_state)
+                moves.append(played_cell(game_state, next_state))
+                collect_stats(game_stats, player)
+                self.notify(
+                    "on_after_move",
+                    game_id,
+                    game_state,
+                    player,
+                    next_state,
+                    move_started,
+                )
+                game_state = next_state
+            except InvalidMove as ex:
+                if self.error_handler:
+                    self.error_handler(ex)
+                self.notify(
+                    "on_invalid_move",
+                    game_id,
+                    game_state,
+                    player,
+                    ex,
+                    move_started,
+                )
+
+    def steps(
+        self, starting_mark: Mark = Mark("X")
+    ) -> Generator[Step, Move | None, GameState]:
+        # Generator version of play, for code that wants to drive the game
+        # itself: interleave many games, decide the moves of many games in a
+        # single batched search, keep the history... Nothing is rendered.
+        # Each turn yields twice:
+        # - first a pending Step, with move=None. The caller can send() a
+        #   Move for that state, or just call next() to let the player
+        #   choose with get_move.
+        # - then the finished Step, with the move that was played.
+        # An invalid move goes to the error handler, and the pending Step of
+        # the same state is yielded again. Nothing can be sent at a finished
+        # Step: that raises ValueError, which ends the generator. When the
+        # game is over, the generator returns the final state (in
+        # StopIteration.value).
+        # Example, letting the players play and keeping the history:
+        #     history = [step for step in game.steps() if step.move]
+        # Example, with moves decided by the caller:
+        #     steps = game.steps()
+        #     step = next(steps)
+        #     finished = steps.send(choose_move(step.state))
+        #     step = next(steps)
+        game_state = GameState(Grid(), starting_mark)
+        moves: list[int] = []
+        game_stats = GameStats()
+        game_id = next(_game_ids)
+        game_started = self.notify("on_game_start", game_id, game_state)
+        while not game_state.game_over:
+            player = self.get_current_player(game_state)
+            move_started = self.notify(
+                "on_before_move", game_id, game_state, player
+            )
+            move = yield Step(game_state, player, None)
+            try:
+                if move is None:
+                    with paced(self.pacing):
+                        move = player.get_move(game_state)
+                    if move is None:
+                        raise InvalidMove("No more possible moves")
+                    collect_stats(game_stats, player)
+                elif move.before_state != game_state:
+                    raise InvalidMove("The move is not from the current state")
+                elif move.mark != game_state.current_mark:
+                    raise InvalidMove(f"It is not the turn of {move.mark}")
+                else:
+                    move = game_state.make_move_to(move.cell_index)
+            except InvalidMove as ex:
+                if self.error_handler:
+                    self.error_handler(ex)
+                self.notify(
+                    "on_invalid_move",
+                    game_id,
+                    game_state,
+                    player,
+                    ex,
+                    move_started,
+                )
+                continue
+            self.notify(
+                "on_after_move",
+                game_id,
+                game_state,
+                player,
+                move.after_state,
+                move_started,
+            )
+            if (yield Step(game_state, player, move)) is not None:
+                raise ValueError("A move can only be sent at a pending Step")
+            moves.append(move.cell_index)
+            game_state = move.after_state
+        self.record(starting_mark, moves, game_stats)
+        self.notify("on_game_end", game_id, game_state, game_started)
+        return game_state
+
+    def notify(self, hook: str, *args) -> float:
+        # Function that calls a hook of every observer, with the current
+        # time as last argument.
+        # Input: the name of the hook, and its arguments but the timestamp
+        # Output: the timestamp, which later hooks use as start time
+        timestamp = time.perf_counter()
+        for observer in self.observers:
+            getattr(observer, hook)(*args, timestamp)
+        return timestamp
+
+    def record(
+        self, starting_mark: Mark, moves: list[int], game_stats: GameStats
+    ) -> None:
+        # Function that gives the record of a finished game to the record
+        # handler, if there is one (for example GameRecordWriter.write), and
+        # its statistics to the stats handler, if there is one.
+        # Input: the starting mark, the cells played, in order, and the
+        # GameStats of the game
+        # Output: None
+        if self.record_handler:
+            self.record_handler(GameRecord(Mark(starting_mark), tuple(moves)))
+        if self.stats_handler:
+            self.stats_handler(game_stats)
 
     def get_current_player(self, game_state: GameState) -> Player:
         # Functions that identifies the current player. Current mark was
@@ -49,3 +268,21 @@ class TicTacToe:
             return self.player1
         else:
             return self.player2
+
+
+def collect_stats(game_stats: GameStats, player: Player) -> None:
+    # Function that adds the stats of the decision a player just made to
+    # the stats of the game, if the player searched.
+    if player.last_stats is not None:
+        game_stats.add(player.mark, player.last_stats)
+
+
+def played_cell(before_state: GameState, after_state: GameState) -> int:
+    # Function that finds the cell played between two consecutive states:
+    # the only empty cell of the first state that is not empty in the
+    # second. Players return the new state, not the move, so this is how
+    # the engine keeps the move sequence of a game.
+    # Input: a state and the state after the move
+    # Output: the index of the cell played
+    played = before_state.grid.empty_bits & ~after_state.grid.empty_bits
+    return played.bit_length() - 1
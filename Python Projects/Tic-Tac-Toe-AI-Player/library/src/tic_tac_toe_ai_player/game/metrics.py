@@ -0,0 +1,225 @@
+# tic_tac_toe/game/metrics.py
+
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from tic_tac_toe_ai_player.game.observers import GameObserver
+from tic_tac_toe_ai_player.game.players import Player
+from tic_tac_toe_ai_player.logic.models import GameState
+
+# Metrics of the games played by engines, collected by an observer (see
+# game/observers.py) and exported in the Prometheus text format, for example
+# to a file read by the textfile collector of a node exporter, or in JSON.
+#
+# Exported metrics:
+#   tictactoe_games_started_total
+#   tictactoe_games_total{outcome="X"|"O"|"tie"}
+#   tictactoe_games_per_second: games finished per second since the first
+#     game started
+#   tictactoe_move_seconds{player=...}: histogram of the time taken by each
+#     move, by player class
+#   tictactoe_invalid_moves_total{player=...}
+#   tictactoe_game_seconds: histogram of the duration of the games
+
+# Upper bounds of the histogram buckets, in seconds, from a tenth of a
+# millisecond to 10 s.
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    # A histogram of durations, with a count for each bucket of BUCKETS and
+    # one for the durations above the last bound.
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        # Output: the (upper bound, count of the durations up to it) pairs
+        # of the buckets, the last one being "+Inf" with the total count
+        bounds = [repr(bound) for bound in BUCKETS] + ["+Inf"]
+        total = 0
+        pairs = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class MetricsObserver(GameObserver):
+    # Observer that aggregates the metrics of every game it observes. The
+    # same observer can be given to many engines, in many threads: a lock
+    # protects the counters.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.games_started = 0
+        self.outcomes = {"X": 0, "O": 0, "tie": 0}
+        self.move_seconds: dict[str, Histogram] = {}
+        self.invalid_moves: dict[str, int] = {}
+        self.game_seconds = Histogram()
+        self.first_start: float | None = None
+        self.last_end: float | None = None
+
+    def on_game_start(
+        self, game_id: int, game_state: GameState, timestamp: float
+    ) -> None:
+        with self._lock:
+            self.games_started += 1
+            if self.first_start is None:
+                self.first_start = timestamp
+
+    def on_after_move(
+        self,
+        game_id: int,
+        game_state: GameState,
+        player: Player,
+        next_state: GameState,
+        started: float,
+        timestamp: float,
+    ) -> None:
+        name = type(player).__name__
+        with self._lock:
+            if name not in self.move_seconds:
+                self.move_seconds[name] = Histogram()
+            self.move_seconds[name].observe(timestamp - started)
+
+    def on_invalid_move(
+        self,
+        game_id: int,
+        game_state: GameState,
+        player: Player,
+        error: Exception,
+        started: float,
+        timestamp: float,
+    ) -> None:
+        name = type(player).__name__
+        with self._lock:
+            self.invalid_moves[name] = self.invalid_moves.get(name, 0) + 1
+
+    def on_game_end(
+        self,
+        game_id: int,
+        game_state: GameState,
+        started: float,
+        timestamp: float,
+    ) -> None:
+        outcome = game_state.winner or "tie"
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.game_seconds.observe(timestamp - started)
+            self.last_end = timestamp
+
+    @property
+    def games_per_second(self) -> float:
+        # Output: the number of games finished per second, from the start
+        # of the first game to the end of the last one
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        elapsed = self.last_end - self.first_start
+        return sum(self.outcomes.values()) / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        # Output: the metrics, as a dictionary that can be dumped in JSON
+        with self._lock:
+            return {
+                "games_started": self.games_started,
+                "games": dict(self.outcomes),
+                "games_per_second": self.games_per_second,
+                "move_seconds": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.move_seconds.items()
+                },
+                "invalid_moves": dict(self.invalid_moves),
+                "game_seconds": self.game_seconds.to_dict(),
+            }
+
+    def to_prometheus(self) -> str:
+        # Output: the metrics, in the Prometheus text exposition format
+        with self._lock:
+            lines = [
+                "# HELP tictactoe_games_started_total Games started.",
+                "# TYPE tictactoe_games_started_total counter",
+                f"tictactoe_games_started_total {self.games_started}",
+                "# HELP tictactoe_games_total Games finished, by outcome.",
+                "# TYPE tictactoe_games_total counter",
+            ]
+            lines += [
+                f'tictactoe_games_total{{outcome="{outcome}"}} {count}'
+                for outcome, count in self.outcomes.items()
+            ]
+            lines += [
+                "# HELP tictactoe_games_per_second Games finished per second.",
+                "# TYPE tictactoe_games_per_second gauge",
+                f"tictactoe_games_per_second {self.games_per_second}",
+                "# HELP tictactoe_move_seconds Time taken by a move.",
+                "# TYPE tictactoe_move_seconds histogram",
+            ]
+            for name, histogram in self.move_seconds.items():
+                lines += _histogram_lines(
+                    "tictactoe_move_seconds", histogram, f'player="{name}"'
+                )
+            lines += [
+                "# HELP tictactoe_invalid_moves_total Invalid moves.",
+                "# TYPE tictactoe_invalid_moves_total counter",
+            ]
+            lines += [
+                f'tictactoe_invalid_moves_total{{player="{name}"}} {count}'
+                for name, count in self.invalid_moves.items()
+            ]
+            lines += [
+                "# HELP tictactoe_game_seconds Duration of a game.",
+                "# TYPE tictactoe_game_seconds histogram",
+            ]
+            lines += _histogram_lines(
+                "tictactoe_game_seconds", self.game_seconds
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        _write_atomically(path, self.to_prometheus())
+
+    def write_json(self, path: str | Path) -> None:
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+
+def _histogram_lines(
+    name: str, histogram: Histogram, labels: str = ""
+) -> list[str]:
+    # Output: the lines of a histogram in the Prometheus text format
+    separator = "," if labels else ""
+    lines = [
+        f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}'
+        for bound, count in histogram.cumulative()
+    ]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+def _write_atomically(path: str | Path, text: str) -> None:
+    # Function that writes a file through a temporary file and a rename, so
+    # a reader never sees a partly written file.
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{time.time_ns()}")
+    temporary.write_text(text)
+    os.replace(temporary, path)
@@ -0,0 +1,64 @@
+# tic_tac_toe/game/observers.py
+
+from tic_tac_toe_ai_player.game.players import Player
+from tic_tac_toe_ai_player.logic.models import GameState
+
+# Observers follow the games played by a TicTacToe engine (see its observers
+# field) without changing them: monitoring, metrics, logs... The engine calls
+# their hooks at each step of a game, with a timestamp from
+# time.perf_counter(), a monotonic clock with a high resolution. Hooks that
+# end a step also get the timestamp of its start, so durations need no
+# bookkeeping.
+# Every game gets a number, unique in the process, so an observer can tell
+# apart the games of an engine that plays several at the same time.
+# Hooks run in the thread or the task of the game, and should return
+# quickly: the game waits for them.
+
+
+class GameObserver:
+    # Base class of the observers, with hooks that do nothing. Subclasses
+    # override the ones they need.
+    def on_game_start(
+        self, game_id: int, game_state: GameState, timestamp: float
+    ) -> None:
+        pass
+
+    def on_before_move(
+        self,
+        game_id: int,
+        game_state: GameState,
+        player: Player,
+        timestamp: float,
+    ) -> None:
+        pass
+
+    def on_after_move(
+        self,
+        game_id: int,
+        game_state: GameState,
+        player: Player,
+        next_state: GameState,
+        started: float,
+        timestamp: float,
+    ) -> None:
+        pass
+
+    def on_invalid_move(
+        self,
+        game_id: int,
+        game_state: GameState,
+        player: Player,
+        error: Exception,
+        started: float,
+        timestamp: float,
+    ) -> None:
+        pass
+
+    def on_game_end(
+        self,
+        game_id: int,
+        game_state: GameState,
+        started: float,
+        timestamp: float,
+    ) -> None:
+        pass
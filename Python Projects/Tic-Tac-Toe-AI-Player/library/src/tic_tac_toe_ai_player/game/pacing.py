@@ -0,0 +1,91 @@
+# tic_tac_toe/game/pacing.py
+
+import abc
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+# Pacing decides how long a computer player takes to answer. A human facing
+# the computer wants its moves to appear at a steady pace, while a batch of
+# simulated games wants them as fast as possible. The same player can be
+# used in both: its own pacing is only a default, and the engine (see the
+# pacing field of TicTacToe) can choose another one for the moves it asks
+# for, through a context variable. Each asyncio task has its own copy of
+# the context, so games running in the same event loop can use different
+# pacings.
+
+
+class Pacing(metaclass=abc.ABCMeta):
+    # A pacing policy. A player computes its move first, then gives the
+    # time it took to the policy, which waits for as long as it wants.
+    # wait blocks, for the synchronous engine. wait_async is used by the
+    # asynchronous engine, and must not block the event loop.
+    @abc.abstractmethod
+    def wait(self, elapsed: float) -> None:
+        """Wait after a move that took elapsed seconds to compute."""
+
+    @abc.abstractmethod
+    async def wait_async(self, elapsed: float) -> None:
+        """Wait, without blocking the event loop, after a move."""
+
+
+@dataclass(frozen=True)
+class NoPacing(Pacing):
+    # Answers as soon as the move is computed, for simulations and other
+    # throughput runs. In an event loop, it still yields once, so that a
+    # player that computes its moves inline does not keep the other games
+    # waiting for the whole game.
+    def wait(self, elapsed: float) -> None:
+        pass
+
+    async def wait_async(self, elapsed: float) -> None:
+        await asyncio.sleep(0)
+
+
+@dataclass(frozen=True)
+class MinimumThinkTime(Pacing):
+    # Makes every move take at least seconds: only the time left after the
+    # computation is slept, so a long search is not delayed any further.
+    seconds: float
+
+    def __post_init__(self) -> None:
+        if self.seconds < 0:
+            raise ValueError("The minimum think time cannot be negative")
+
+    def wait(self, elapsed: float) -> None:
+        if elapsed < self.seconds:
+            time.sleep(self.seconds - elapsed)
+
+    async def wait_async(self, elapsed: float) -> None:
+        await asyncio.sleep(max(0.0, self.seconds - elapsed))
+
+
+NO_PACING = NoPacing()
+
+_pacing: ContextVar[Pacing | None] = ContextVar("pacing", default=None)
+
+
+def current_pacing(default: Pacing) -> Pacing:
+    # Input: the pacing of the player
+    # Output: the pacing chosen by the engine for the current context, or
+    # the player's own if the engine did not choose one
+    pacing = _pacing.get()
+    return default if pacing is None else pacing
+
+
+@contextmanager
+def paced(pacing: Pacing | None) -> Iterator[None]:
+    # Context manager that makes every player use the given pacing inside
+    # the block. With None, the pacing of the enclosing context is kept.
+    # Example: with paced(NO_PACING): game.play()
+    if pacing is None:
+        yield
+        return
+    token = _pacing.set(pacing)
+    try:
+        yield
+    finally:
+        _pacing.reset(token)
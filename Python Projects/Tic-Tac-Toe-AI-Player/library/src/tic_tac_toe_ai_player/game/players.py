@@ -1,13 +1,37 @@
 # tic_tac_toe/game/players.py
 
 import abc
+import asyncio
+import random
 import time
+from concurrent.futures import Executor
+from typing import Callable, TypeAlias
+from tic_tac_toe_ai_player.game.clock import GameClock
+from tic_tac_toe_ai_player.game.pacing import (
+    MinimumThinkTime,
+    Pacing,
+    current_pacing,
+)
 from tic_tac_toe_ai_player.logic.models import GameState, Mark, Move
 from tic_tac_toe_ai_player.logic.exceptions import InvalidMove
-from tic_tac_toe_ai_player.logic.minimax import find_best_move
+from tic_tac_toe_ai_player.logic.minimax import (
+    SearchResult,
+    SearchStats,
+    find_best_move,
+    search,
+)
+from tic_tac_toe_ai_player.logic.tablebase import Tablebase
+from tic_tac_toe_ai_player.logic.transpositions import TranspositionTable
+
+
+SearchCallback: TypeAlias = Callable[[SearchStats], None]
 
 
 class Player(metaclass=abc.ABCMeta):
+    # The statistics of the player's last decision, for players that search
+    # (see MinimaxComputerPlayer). The engine adds them up for each game.
+    last_stats: SearchStats | None = None
+
     def __init__(self, mark: Mark) -> None:
         self.mark = mark
 
@@ -27,6 +51,17 @@ class Player(metaclass=abc.ABCMeta):
         else:
             raise InvalidMove("It's the other player's turn")
 
+    async def make_move_async(self, game_state: GameState) -> GameState:
+        # Asynchronous version of make_move, used by TicTacToe.play_async.
+        # Same checks, but awaits get_move_async so that the event loop can
+        # run other games while this player thinks.
+        if self.mark is game_state.current_mark:
+            if move := await self.get_move_async(game_state):
+                return move.after_state
+            raise InvalidMove("No more possible moves")
+        else:
+            raise InvalidMove("It's the other player's turn")
+
     @abc.abstractmethod
     def get_move(self, game_state: GameState) -> Move | None:
         # Abstract method to prompt the player to make a move. Makes room for
@@ -36,18 +71,62 @@ class Player(metaclass=abc.ABCMeta):
         # Output: A move or None if there is no move left.
         """Return the current player's move in the given game state."""
 
+    async def get_move_async(self, game_state: GameState) -> Move | None:
+        # Asynchronous version of get_move. By default, get_move runs in a
+        # thread, since it may block (a human player waiting for input, for
+        # example). Subclasses that can wait without blocking override it.
+        return await asyncio.to_thread(self.get_move, game_state)
+
 
 class ComputerPlayer(Player, metaclass=abc.ABCMeta):
-    # Classe that extends the Player class to add a delay specific to the AI
-    # players.
-    def __init__(self, mark: Mark, delay_seconds: float = 0.25) -> None:
+    # Classe that extends the Player class to add a pacing specific to the
+    # AI players (see game/pacing.py). By default, a move takes at least
+    # delay_seconds: the player computes it, then sleeps for the time left.
+    # Another pacing can be given to the player, and the engine can replace
+    # it for the games it plays (see the pacing field of TicTacToe).
+    # In asynchronous games, the pacing does not block the event loop, and
+    # players with a costly get_computer_move (offload = True) run it in an
+    # executor: the one given to the player, or the event loop's default
+    # thread pool. The event loop is then free to run the other games in the
+    # meantime.
+    offload = False
+
+    def __init__(
+        self,
+        mark: Mark,
+        delay_seconds: float = 0.25,
+        executor: Executor | None = None,
+        pacing: Pacing | None = None,
+    ) -> None:
         super().__init__(mark)
         self.delay_seconds = delay_seconds
+        self.executor = executor
+        if pacing is None:
+            pacing = MinimumThinkTime(delay_seconds)
+        self.pacing = pacing
 
     def get_move(self, game_state: GameState) -> Move | None:
-        # The overriding method with added delay
-        time.sleep(self.delay_seconds)
-        return self.get_computer_move(game_state)
+        # The overriding method with added pacing
+        pacing = current_pacing(self.pacing)
+        start = time.perf_counter()
+        move = self.get_computer_move(game_state)
+        pacing.wait(time.perf_counter() - start)
+        return move
+
+    async def get_move_async(self, game_state: GameState) -> Move | None:
+        # The asynchronous version, with a pacing that does not block the
+        # event loop.
+        pacing = current_pacing(self.pacing)
+        start = time.perf_counter()
+        if not self.offload:
+            move = self.get_computer_move(game_state)
+        else:
+            loop = asyncio.get_running_loop()
+            move = await loop.run_in_executor(
+                self.executor, self.get_computer_move, game_state
+            )
+        await pacing.wait_async(time.perf_counter() - start)
+        return move
 
     @abc.abstractmethod
     def get_computer_move(self, game_state: GameState) -> Move | None:
@@ -66,9 +145,119 @@ class MinimaxComputerPlayer(ComputerPlayer):
     # A subclass of ComputerPlayer that uses the find_best_move function,
     # based on the minimax algorithm, to find the best move. Uses a random
     # move at the start of the game because minimax is not usefull at that
-    # point.
+    # point, unless a tablebase is given: the positions found in the
+    # tablebase are then answered from it, the empty grid included, and the
+    # search is only used for the others.
+    # Solved positions are kept in a transposition table from one turn to
+    # the next. Each player has its own table, unless one is given: passing
+    # transpositions.shared_table() to every player shares a single table in
+    # the whole process.
+    # With a time limit, the player uses the anytime search (see
+    # minimax.search) and plays the best move found in time: move_time
+    # limits every move, and a GameClock limits the whole game of the
+    # player. The clock is reset when a new game starts, which the player
+    # notices when it has to move with more empty cells than in its
+    # previous move. The result of the last timed search is kept in
+    # last_result.
+    # Every decision, the random first move included, gets its own
+    # SearchStats in last_stats, which is also given to on_search if there
+    # is one. on_search runs where the move is computed, so in an executor
+    # thread for asynchronous games.
+    offload = True
+
+    def __init__(
+        self,
+        mark: Mark,
+        delay_seconds: float = 0.25,
+        pruning: bool = True,
+        table: TranspositionTable | None = None,
+        tablebase: Tablebase | None = None,
+        executor: Executor | None = None,
+        pacing: Pacing | None = None,
+        move_time: float | None = None,
+        clock: GameClock | None = None,
+        on_search: SearchCallback | None = None,
+    ) -> None:
+        super().__init__(mark, delay_seconds, executor, pacing)
+        if move_time is not None and move_time <= 0:
+            raise ValueError("The time limit of a move must be positive")
+        self.pruning = pruning
+        self.table = TranspositionTable() if table is None else table
+        self.tablebase = tablebase
+        self.move_time = move_time
+        self.clock = clock
+        self.on_search = on_search
+        self.last_result: SearchResult | None = None
+        self._last_empty_count: int | None = None
+
     def get_computer_move(self, game_state: GameState) -> Move | None:
-        if game_state.game_not_started:
+        self.last_stats = SearchStats()
+        move = self.decide(game_state, self.last_stats)
+        if self.on_search is not None:
+            self.on_search(self.last_stats)
+        return move
+
+    def decide(self, game_state: GameState, stats: SearchStats) -> Move | None:
+        # Function that chooses the move, and fills the stats of the search.
+        if game_state.game_not_started and self.tablebase is None:
             return game_state.make_random_move()
-        else:
+        budget = self.time_budget(game_state)
+        if budget is None:
+            return find_best_move(
+                game_state,
+                pruning=self.pruning,
+                stats=stats,
+                table=self.table,
+                tablebase=self.tablebase,
+            )
+        start = time.monotonic()
+        self.last_result = search(
+            game_state,
+            deadline=start + budget,
+            stats=stats,
+            table=self.table,
+            tablebase=self.tablebase,
+        )
+        if self.clock is not None:
+            self.clock.charge(time.monotonic() - start)
+        return self.last_result.move
+
+    def time_budget(self, game_state: GameState) -> float | None:
+        # Input: the state in which the player has to move
+        # Output: the seconds the player can spend on the move, or None if
+        # its time is not limited
+        if self.clock is None:
+            return self.move_time
+        empty_count = game_state.grid.empty_count
+        if self._last_empty_count is None or (
+            empty_count >= self._last_empty_count
+        ):
+            self.clock.reset()
+        self._last_empty_count = empty_count
+        budget = self.clock.budget(game_state)
+        if self.move_time is not None:
+            budget = min(budget, self.move_time)
+        return budget
+
+
+class TablebasePlayer(ComputerPlayer):
+    # A subclass of ComputerPlayer that plays perfectly by reading the best
+    # moves from a tablebase (see logic/tablebase.py) instead of searching.
+    # When several moves are equally good, picks one of them randomly. Falls
+    # back to a search for the rare positions that are not in the
+    # tablebase.
+    def __init__(
+        self,
+        mark: Mark,
+        tablebase: Tablebase,
+        delay_seconds: float = 0.25,
+        pacing: Pacing | None = None,
+    ) -> None:
+        super().__init__(mark, delay_seconds, pacing=pacing)
+        self.tablebase = tablebase
+
+    def get_computer_move(self, game_state: GameState) -> Move | None:
+        best_moves = self.tablebase.best_moves(game_state)
+        if best_moves is None:
             return find_best_move(game_state)
+        return random.choice(best_moves) if best_moves else None
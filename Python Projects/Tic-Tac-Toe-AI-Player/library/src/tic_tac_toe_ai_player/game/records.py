@@ -0,0 +1,194 @@
+# tic_tac_toe/game/records.py
+
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterator, NamedTuple
+
+from tic_tac_toe_ai_player.logic.models import (
+    CODES_PER_MARK,
+    GameState,
+    Grid,
+    Mark,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Compact storage for finished games. A game is fully described by its
+# starting mark and the cells played, in order, so that is all a record
+# keeps: 10 nibbles (4-bit values) in 5 bytes. Nibble 0 is the header (bit 0
+# set if O started), nibbles 1 to 9 are the cells of the moves, padded with
+# NO_MOVE. Nibble 2k is the low half of byte k, nibble 2k+1 the high half.
+#
+# A record file is MAGIC followed by the records, back to back. Records
+# have a fixed size, so a file can be appended to while it is being read,
+# and mapped into a NumPy array in one go (load_records, needs the numpy
+# extra).
+
+MAGIC = b"TTTREC01"
+RECORD_SIZE = 5
+NO_MOVE = 0xF
+O_STARTS = 0x1
+
+
+class GameRecord(NamedTuple):
+    # A finished game: who started, and the cells that were played.
+    starting_mark: Mark
+    moves: tuple[int, ...]
+
+    def to_bytes(self) -> bytes:
+        # Input: the record
+        # Output: its 5 bytes
+        header = O_STARTS if self.starting_mark == Mark.NAUGHT else 0
+        nibbles = (header, *self.moves) + (NO_MOVE,) * (9 - len(self.moves))
+        value = sum(
+            nibble << 4 * index for index, nibble in enumerate(nibbles)
+        )
+        return value.to_bytes(RECORD_SIZE, "little")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameRecord":
+        # Input: the 5 bytes of a record
+        # Output: the GameRecord
+        value = int.from_bytes(data, "little")
+        nibbles = [value >> 4 * index & 0xF for index in range(10)]
+        starting_mark = Mark.NAUGHT if nibbles[0] & O_STARTS else Mark.CROSS
+        moves = tuple(nibble for nibble in nibbles[1:] if nibble != NO_MOVE)
+        return cls(starting_mark, moves)
+
+    def states(self) -> Iterator[GameState]:
+        # Function that replays the game, from the empty grid to the final
+        # state. The moves go through make_move_to, so a corrupted record
+        # raises InvalidMove instead of producing an invalid state.
+        # Input: the record
+        # Output: an iterator over the states of the game
+        game_state = GameState(Grid(), self.starting_mark)
+        yield game_state
+        for cell_index in self.moves:
+            game_state = game_state.make_move_to(cell_index).after_state
+            yield game_state
+
+
+class GameRecordWriter:
+    # Appends records to a record file. The header is written when the file
+    # is new, and checked when it is not, so records are never appended to
+    # another kind of file. Writes are buffered by the file object: use the
+    # writer as a context manager, or call close(), to flush them.
+    # Its write method can be given to TicTacToe as record_handler, to
+    # record every game the engine plays.
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        # In append mode, writes always go to the end of the file, so the
+        # header can be read back first.
+        self._file: BinaryIO = open(self.path, "a+b")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            return
+        self._file.seek(0)
+        header = self._file.read(len(MAGIC))
+        try:
+            _check_magic(header, self.path)
+        except ValueError:
+            self._file.close()
+            raise
+
+    def write(self, record: GameRecord) -> None:
+        self._file.write(record.to_bytes())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "GameRecordWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_records(
+    path: str | Path, chunk_records: int = 4096
+) -> Iterator[GameRecord]:
+    # Function that reads the records of a file lazily, a chunk at a time.
+    # Input: the path of a record file
+    # Output: an iterator over its GameRecords
+    with open(path, "rb") as file:
+        _check_magic(file.read(len(MAGIC)), path)
+        while chunk := file.read(chunk_records * RECORD_SIZE):
+            for start in range(0, len(chunk) - RECORD_SIZE + 1, RECORD_SIZE):
+                yield GameRecord.from_bytes(chunk[start:start + RECORD_SIZE])
+
+
+class RecordArrays(NamedTuple):
+    # The records of a file as arrays, one row per game.
+    # starting_marks: 1 if X started, 2 if O started (see logic/batch.py)
+    # moves: an (N, 9) int8 array of cells, padded with -1
+    # lengths: the number of moves of each game
+    starting_marks: "np.ndarray"
+    moves: "np.ndarray"
+    lengths: "np.ndarray"
+
+
+def load_records(path: str | Path) -> RecordArrays:
+    # Function that maps a whole record file into memory and decodes it
+    # into arrays in a few vectorized operations.
+    # Input: the path of a record file
+    # Output: a RecordArrays
+    import numpy as np
+
+    with open(path, "rb") as file:
+        _check_magic(file.read(len(MAGIC)), path)
+    raw = np.memmap(path, dtype=np.uint8, mode="r", offset=len(MAGIC))
+    raw = raw[:len(raw) - len(raw) % RECORD_SIZE].reshape(-1, RECORD_SIZE)
+    nibbles = np.empty((len(raw), 2 * RECORD_SIZE), dtype=np.int8)
+    nibbles[:, 0::2] = raw & 0xF
+    nibbles[:, 1::2] = raw >> 4
+    moves = nibbles[:, 1:]
+    played = moves != NO_MOVE
+    moves[~played] = -1
+    starting_marks = np.where(nibbles[:, 0] & O_STARTS, 2, 1).astype(np.int8)
+    return RecordArrays(
+        starting_marks, moves, played.sum(axis=1).astype(np.int8)
+    )
+
+
+def position_codes(records: RecordArrays) -> "np.ndarray":
+    # Function that replays every game of a RecordArrays at once, as
+    # position codes (see GameState.to_code): each move adds the digit of
+    # its mark to the code of the position before it.
+    # Input: a RecordArrays
+    # Output: an (N, 10) uint16 array where column t is the code of the
+    # position after t moves. Once a game is over, its last position is
+    # repeated.
+    import numpy as np
+
+    starting_marks = records.starting_marks.astype(np.int32)[:, None]
+    # 1 for X and 2 for O, like the digits of the codes
+    marks = np.where(np.arange(9) % 2 == 0, starting_marks, 3 - starting_marks)
+    moves = records.moves.astype(np.int32)
+    digits = np.where(moves >= 0, marks * 3 ** np.maximum(moves, 0), 0)
+    codes = np.empty((len(digits), 10), dtype=np.int32)
+    codes[:, 0] = np.where(starting_marks[:, 0] == 2, CODES_PER_MARK, 0)
+    codes[:, 1:] = codes[:, :1] + np.cumsum(digits, axis=1)
+    return codes.astype(np.uint16)
+
+
+def encode_records(
+    starting_marks: "np.ndarray", moves: "np.ndarray"
+) -> bytes:
+    # Function that encodes many games at once, for example the results of
+    # game/simulation.py, in the record format. The bytes can be appended
+    # to a record file after its header.
+    # Input: the starting mark values (1 for X, 2 for O) and the (N, 9)
+    # moves, padded with -1
+    # Output: the bytes of the records
+    import numpy as np
+
+    moves = np.asarray(moves, dtype=np.int8).reshape(-1, 9)
+    nibbles = np.empty((len(moves), 2 * RECORD_SIZE), dtype=np.uint8)
+    nibbles[:, 0] = np.asarray(starting_marks) == 2
+    nibbles[:, 1:] = np.where(moves < 0, NO_MOVE, moves)
+    return (nibbles[:, 0::2] | nibbles[:, 1::2] << 4).tobytes()
+
+
+def _check_magic(header: bytes, path: str | Path) -> None:
+    if header != MAGIC:
+        raise ValueError(f"{path} is not a game record file")
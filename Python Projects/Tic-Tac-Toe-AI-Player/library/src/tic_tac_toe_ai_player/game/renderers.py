@@ -13,3 +13,10 @@ class Renderer(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def render(self, game_state: GameState) -> None:
         """Render the current game state."""
+
+
+class NullRenderer(Renderer):
+    # A renderer that does not display anything, for games that are played
+    # without a frontend (simulations, benchmarks, servers...).
+    def render(self, game_state: GameState) -> None:
+        pass
@@ -0,0 +1,226 @@
+# tic_tac_toe/game/simulation.py
+
+import abc
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from tic_tac_toe_ai_player.logic.batch import (
+    CROSS,
+    EMPTY,
+    MARK_VALUES,
+    NAUGHT,
+    POWERS_OF_3,
+)
+from tic_tac_toe_ai_player.logic.models import (
+    CELLS_OF_MASK,
+    FULL_MASK,
+    WINNING_BOARDS,
+    Mark,
+)
+from tic_tac_toe_ai_player.logic.tablebase import MAGIC, SLOTS, Tablebase
+
+# A simulator that plays many games at once, in lockstep: every game of a
+# batch plays its first move, then every game still running plays its
+# second move, and so on. A game is a few integers in NumPy arrays (the
+# position code of its position, which is also its tablebase slot, and the
+# bitboards of the empty cells and of each mark), so a turn of the whole
+# batch is a few array operations instead of one Python loop per game.
+# There is no renderer and no delay: this is meant to measure policies over
+# millions of games. Needs the numpy extra.
+
+# Layout of a tablebase record (see logic/tablebase.py).
+TABLEBASE_RECORD = np.dtype(
+    [("score", "i1"), ("distance", "u1"), ("best_cells", "<u2")]
+)
+
+CELL_BITS = 1 << np.arange(9, dtype=np.int16)
+
+# Lookup tables indexed by a 9-bit board:
+# - WINNING_BITBOARDS[bits] is True if bits contains a winning pattern.
+# - CELL_COUNTS[bits] is the number of cells in bits.
+# - NTH_CELL[bits, n] is the index of the n-th cell in bits.
+WINNING_BITBOARDS = np.array(WINNING_BOARDS, dtype=bool)
+CELL_COUNTS = np.array([len(cells) for cells in CELLS_OF_MASK], dtype=np.int8)
+NTH_CELL = np.array(
+    [cells + (-1,) * (9 - len(cells)) for cells in CELLS_OF_MASK],
+    dtype=np.int8,
+)
+
+
+def random_cells(bits: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Function that picks one random cell in each bitboard.
+    # Input: an array of non-empty 9-bit boards and a random generator
+    # Output: an array with the index of the cell picked in each board
+    counts = CELL_COUNTS[bits]
+    nth = (rng.random(len(bits)) * counts).astype(np.int8)
+    return NTH_CELL[bits, np.minimum(nth, counts - 1)]
+
+
+class Policy(metaclass=abc.ABCMeta):
+    # A way to choose moves for a batch of games, the batch version of a
+    # ComputerPlayer.
+    @abc.abstractmethod
+    def choose(
+        self,
+        slots: np.ndarray,
+        empty_bits: np.ndarray,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        # Input: the position codes of the M games where this policy has to
+        # play (see GameState.to_code), which are also their tablebase
+        # slots, the bitboards of their empty cells, and the random
+        # generator of the simulation. Positions can be rebuilt from the
+        # codes with batch.codes_to_positions.
+        # Output: an array of M cell indexes, all empty on their board
+        """Return the cell to play in each game."""
+
+
+class RandomPolicy(Policy):
+    # Plays a random empty cell, like RandomComputerPlayer.
+    def choose(
+        self,
+        slots: np.ndarray,
+        empty_bits: np.ndarray,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        return random_cells(empty_bits, rng)
+
+
+class TablePolicy(Policy):
+    # Plays from a lookup table: for every tablebase slot, the bitboard of
+    # the cells the policy may play. One of them is picked randomly. Slots
+    # without any allowed empty cell fall back to a random empty cell.
+    def __init__(self, allowed_cells: np.ndarray) -> None:
+        allowed_cells = np.asarray(allowed_cells, dtype=np.int16)
+        if allowed_cells.shape != (2 * SLOTS,):
+            raise ValueError(
+                f"Expected one bitboard for each of the {2 * SLOTS} slots"
+            )
+        self.allowed_cells = allowed_cells
+
+    @classmethod
+    def from_tablebase(
+        cls, tablebase: Tablebase | str | Path
+    ) -> "TablePolicy":
+        # Function that builds the perfect-play policy of a tablebase: the
+        # allowed cells of a position are its best cells.
+        # Input: a Tablebase, or the path of a tablebase file
+        # Output: a TablePolicy
+        if isinstance(tablebase, Tablebase):
+            tablebase = tablebase.path
+        records = np.memmap(
+            tablebase, dtype=TABLEBASE_RECORD, mode="r", offset=len(MAGIC)
+        )
+        return cls(records["best_cells"].astype(np.int16))
+
+    def choose(
+        self,
+        slots: np.ndarray,
+        empty_bits: np.ndarray,
+        rng: np.random.Generator,
+    ) -> np.ndarray:
+        allowed = self.allowed_cells[slots] & empty_bits
+        allowed = np.where(allowed == 0, empty_bits, allowed)
+        return random_cells(allowed, rng)
+
+
+class SimulationResult(NamedTuple):
+    # Results of simulate, one row per game.
+    # winners: the mark value of the winner (CROSS or NAUGHT), EMPTY on a tie
+    # lengths: the number of moves of each game
+    # moves: an (N, 9) int8 array with the cell of each move, in order,
+    # padded with -1 (None if the moves were not kept)
+    winners: np.ndarray
+    lengths: np.ndarray
+    moves: np.ndarray | None
+
+    def outcome_counts(self) -> dict[str, int]:
+        # Output: the number of games won by X, won by O and tied
+        counts = np.bincount(self.winners, minlength=3)
+        return {
+            Mark.CROSS.value: int(counts[CROSS]),
+            Mark.NAUGHT.value: int(counts[NAUGHT]),
+            "tie": int(counts[EMPTY]),
+        }
+
+    def length_counts(self) -> np.ndarray:
+        # Output: the number of games for each length, from 0 to 9 moves
+        return np.bincount(self.lengths, minlength=10)
+
+
+def simulate(
+    games: int,
+    policy_x: Policy,
+    policy_o: Policy,
+    starting_mark: Mark = Mark.CROSS,
+    seed: int | None = None,
+    batch_size: int = 1_000_000,
+    keep_moves: bool = True,
+) -> SimulationResult:
+    # Function that plays a number of games between two policies, in
+    # batches of batch_size games played in lockstep.
+    # Input: the number of games, the policy of each mark, the starting mark,
+    # a seed for the random generator, the batch size and whether to keep
+    # the move sequences.
+    # Output: a SimulationResult
+    rng = np.random.default_rng(seed)
+    winners = np.empty(games, dtype=np.int8)
+    lengths = np.empty(games, dtype=np.int8)
+    moves = np.full((games, 9), -1, dtype=np.int8) if keep_moves else None
+    for start in range(0, games, batch_size):
+        stop = min(start + batch_size, games)
+        _simulate_batch(
+            stop - start,
+            {CROSS: policy_x, NAUGHT: policy_o},
+            MARK_VALUES[Mark(starting_mark)],
+            rng,
+            winners[start:stop],
+            lengths[start:stop],
+            None if moves is None else moves[start:stop],
+        )
+    return SimulationResult(winners, lengths, moves)
+
+
+def _simulate_batch(
+    games: int,
+    policies: dict[int, Policy],
+    starting_value: int,
+    rng: np.random.Generator,
+    winners: np.ndarray,
+    lengths: np.ndarray,
+    moves: np.ndarray | None,
+) -> None:
+    # Plays one batch of games and fills the result arrays in place. The
+    # arrays of the running games are compacted after every turn with a
+    # winner, so the finished games cost nothing in the following turns.
+    # game_ids keeps the row of each running game in the result arrays.
+    slots = np.full(games, 0 if starting_value == CROSS else SLOTS, np.int32)
+    empty_bits = np.full(games, FULL_MASK, np.int16)
+    mark_bits = {
+        CROSS: np.zeros(games, np.int16),
+        NAUGHT: np.zeros(games, np.int16),
+    }
+    game_ids = np.arange(games)
+    winners[:] = EMPTY
+    lengths[:] = 9
+    mark = starting_value
+    for turn in range(9):
+        cells = policies[mark].choose(slots, empty_bits, rng)
+        slots += mark * POWERS_OF_3[cells]
+        empty_bits ^= CELL_BITS[cells]
+        mark_bits[mark] |= CELL_BITS[cells]
+        if moves is not None:
+            moves[game_ids, turn] = cells
+        # Only the player who just moved can have won.
+        won = WINNING_BITBOARDS[mark_bits[mark]]
+        if won.any():
+            winners[game_ids[won]] = mark
+            lengths[game_ids[won]] = turn + 1
+            running = ~won
+            slots, empty_bits = slots[running], empty_bits[running]
+            game_ids = game_ids[running]
+            for key in mark_bits:
+                mark_bits[key] = mark_bits[key][running]
+        mark = NAUGHT if mark == CROSS else CROSS
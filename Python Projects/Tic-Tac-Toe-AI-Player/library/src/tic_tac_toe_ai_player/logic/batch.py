@@ -0,0 +1,175 @@
+# tic_tac_toe/logic/batch.py
+
+from typing import NamedTuple
+
+import numpy as np
+
+from tic_tac_toe_ai_player.logic.models import (
+    CELLS_OF_MASK,
+    CODES_PER_MARK,
+    WINNING_MASKS,
+    Mark,
+)
+
+# Batch versions of the GameState queries, to evaluate many boards at once
+# with NumPy instead of building one GameState per board. Needs the numpy
+# extra: pip install tic_tac_toe_ai_player[numpy]
+#
+# A batch of boards is an (N, 9) integer array, with one row per board and
+# one column per cell. Cells hold EMPTY, CROSS or NAUGHT. These are also the
+# digits of the base-3 codes of the tablebase, so a board can be given as
+# its code instead: cell i is the digit i of the code.
+# A position code (see CODES_PER_MARK in models.py) is the code of the board
+# plus CODES_PER_MARK when O starts. codes_to_boards ignores that part, so
+# it accepts position codes too; evaluate_codes reads the starting marks
+# from it when none are given.
+# Marks in results (winner, current mark, starting marks) use the same
+# values, with EMPTY for "no mark".
+
+EMPTY = 0
+CROSS = 1
+NAUGHT = 2
+
+MARK_VALUES = {Mark.CROSS: CROSS, Mark.NAUGHT: NAUGHT}
+
+# LINES[p] holds the 3 cell indexes of the winning pattern p, in the order
+# of WINNING_PATTERNS, so that the "first" winning line is the same one as
+# in GameState.winner.
+LINES = np.array(
+    [CELLS_OF_MASK[mask] for mask in WINNING_MASKS], dtype=np.intp
+)
+
+POWERS_OF_3 = 3 ** np.arange(9, dtype=np.int32)
+
+
+class BatchOutcome(NamedTuple):
+    # Results of evaluate_boards, one value per board.
+    # winner: the mark with a winning line, or EMPTY (GameState.winner)
+    # tie: True for a full grid without winner (GameState.tie)
+    # game_over: winner or tie (GameState.game_over)
+    # current_mark: the mark whose turn it is (GameState.current_mark)
+    # legal: True if GameState would accept the board (validate_game_state)
+    winner: np.ndarray
+    tie: np.ndarray
+    game_over: np.ndarray
+    current_mark: np.ndarray
+    legal: np.ndarray
+
+
+def codes_to_boards(codes: np.ndarray) -> np.ndarray:
+    # Function that unpacks base-3 codes into boards.
+    # Input: an array of N codes
+    # Output: an (N, 9) int8 array of cells
+    codes = np.asarray(codes, dtype=np.int32).reshape(-1, 1)
+    return (codes // POWERS_OF_3 % 3).astype(np.int8)
+
+
+def boards_to_codes(boards: np.ndarray) -> np.ndarray:
+    # Function that packs boards into base-3 codes.
+    # Input: an (N, 9) array of cells
+    # Output: an int32 array of N codes
+    return np.asarray(boards, dtype=np.int32).reshape(-1, 9) @ POWERS_OF_3
+
+
+def positions_to_codes(
+    boards: np.ndarray, starting_marks: Mark | np.ndarray = Mark.CROSS
+) -> np.ndarray:
+    # Function that packs positions into position codes, the batch version
+    # of GameState.to_code.
+    # Input: an (N, 9) array of cells, and the starting mark of the games,
+    # either one Mark for all of them or an array of N mark values
+    # Output: a uint16 array of N position codes
+    codes = boards_to_codes(boards)
+    if isinstance(starting_marks, Mark):
+        starting_marks = MARK_VALUES[starting_marks]
+    codes += np.where(np.asarray(starting_marks) == NAUGHT, CODES_PER_MARK, 0)
+    return codes.astype(np.uint16)
+
+
+def codes_to_positions(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Function that unpacks position codes, the batch version of
+    # GameState.from_code. The positions are not validated: evaluate_boards
+    # tells which ones are legal.
+    # Input: an array of N position codes
+    # Output: an (N, 9) int8 array of cells, and an int8 array of the N
+    # starting mark values
+    codes = np.asarray(codes, dtype=np.int32).reshape(-1)
+    if codes.size and (codes.min() < 0 or codes.max() >= 2 * CODES_PER_MARK):
+        raise ValueError(
+            f"Position codes go from 0 to {2 * CODES_PER_MARK - 1}"
+        )
+    starting_marks = np.where(codes < CODES_PER_MARK, CROSS, NAUGHT)
+    return codes_to_boards(codes), starting_marks.astype(np.int8)
+
+
+def evaluate_boards(
+    boards: np.ndarray, starting_marks: Mark | np.ndarray = Mark.CROSS
+) -> BatchOutcome:
+    # Function that computes the outcome of many boards in one pass. Gives
+    # the same answers as the GameState properties, board by board.
+    # Input: an (N, 9) array of cells, and the starting mark of the games,
+    # either one Mark for all of them or an array of N mark values.
+    # Output: a BatchOutcome
+    boards = np.asarray(boards).reshape(-1, 9)
+    if isinstance(starting_marks, Mark):
+        starting_marks = MARK_VALUES[starting_marks]
+    starting_marks = np.broadcast_to(
+        np.asarray(starting_marks, dtype=np.int8), boards.shape[:1]
+    )
+    other_marks = np.where(starting_marks == CROSS, NAUGHT, CROSS)
+
+    x_count = np.count_nonzero(boards == CROSS, axis=1)
+    o_count = np.count_nonzero(boards == NAUGHT, axis=1)
+    empty_count = np.count_nonzero(boards == EMPTY, axis=1)
+
+    # Cells of every line for every board: (N, 8, 3). The winner is the
+    # owner of the first full line, X first if both own one.
+    lines = boards[:, LINES]
+    x_lines = np.all(lines == CROSS, axis=2)
+    o_lines = np.all(lines == NAUGHT, axis=2)
+    full_lines = x_lines | o_lines
+    has_winner = full_lines.any(axis=1)
+    first_line = full_lines.argmax(axis=1)
+    x_first = x_lines[np.arange(len(boards)), first_line]
+    winner = np.where(
+        has_winner, np.where(x_first, CROSS, NAUGHT), EMPTY
+    ).astype(np.int8)
+
+    tie = ~has_winner & (empty_count == 0)
+    game_over = has_winner | tie
+    current_mark = np.where(
+        x_count == o_count, starting_marks, other_marks
+    ).astype(np.int8)
+
+    # Same checks as validate_grid and validate_game_state.
+    legal = np.all((boards >= EMPTY) & (boards <= NAUGHT), axis=1)
+    legal &= np.abs(x_count - o_count) <= 1
+    legal &= (x_count <= o_count) | (starting_marks == CROSS)
+    legal &= (o_count <= x_count) | (starting_marks == NAUGHT)
+    # The winner played last: they must have one more mark than the other
+    # player if they started, and as many if they did not.
+    winner_count = np.where(winner == CROSS, x_count, o_count)
+    loser_count = np.where(winner == CROSS, o_count, x_count)
+    expected = np.where(winner == starting_marks, 1, 0)
+    legal &= (winner == EMPTY) | (winner_count - loser_count == expected)
+
+    return BatchOutcome(winner, tie, game_over, current_mark, legal)
+
+
+def evaluate_codes(
+    codes: np.ndarray, starting_marks: Mark | np.ndarray | None = None
+) -> BatchOutcome:
+    # Same as evaluate_boards, with boards given as base-3 codes.
+    # Without starting marks, the codes are position codes, and carry the
+    # starting mark of each game. With starting marks, they must be codes
+    # of boards only: a position code where O starts raises ValueError,
+    # since its starting mark could contradict the given one.
+    if starting_marks is None:
+        return evaluate_boards(*codes_to_positions(codes))
+    codes = np.asarray(codes)
+    if codes.size and (codes.min() < 0 or codes.max() >= CODES_PER_MARK):
+        raise ValueError(
+            f"Board codes go from 0 to {CODES_PER_MARK - 1}; pass position "
+            "codes without starting marks"
+        )
+    return evaluate_boards(codes_to_boards(codes), starting_marks)
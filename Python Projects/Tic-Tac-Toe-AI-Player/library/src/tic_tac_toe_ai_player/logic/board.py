@@ -0,0 +1,98 @@
+# tic_tac_toe/logic/board.py
+
+from tic_tac_toe_ai_player.logic.models import (
+    WINNING_BOARDS,
+    GameState,
+    Grid,
+    Mark,
+)
+from tic_tac_toe_ai_player.logic.validators import (
+    ValidationPolicy,
+    get_validation_policy,
+)
+
+# The search board is the mutable board the searches of minimax.py work on.
+# The immutable model builds a Grid, a GameState and a Move for every node
+# of the tree. The search board plays a move with push and takes it back
+# with pop, so a search needs a single board, and only integers change at
+# each node.
+# The board is seen from the player whose turn it is (the negamax form of
+# the searches): mover_bits are the cells of the player to move, and
+# other_bits the cells of the player who just moved. Only the player who
+# just moved can have completed a line, and only a line through the cell
+# they played: push looks their board up in WINNING_BOARDS, a single lookup
+# for all those lines.
+# It is internal to the searches: anything that leaves them is converted
+# back to the immutable GameState and Move (see to_state).
+
+
+class SearchBoard:
+    __slots__ = (
+        "mover_bits",
+        "other_bits",
+        "empty_bits",
+        "won",
+        "x_to_move",
+        "starting_mark",
+        "_played",
+    )
+
+    def __init__(self, game_state: GameState) -> None:
+        # Input: the state to search from
+        grid = game_state.grid
+        self.mover_bits = grid.bits_of(game_state.current_mark)
+        self.other_bits = grid.bits_of(game_state.current_mark.other)
+        self.empty_bits = grid.empty_bits
+        # True when the player who just moved has won. In a valid state, the
+        # winner is always the player who moved last.
+        self.won = game_state.winner is not None
+        self.x_to_move = game_state.current_mark == Mark.CROSS
+        self.starting_mark = game_state.starting_mark
+        # the cells played since the board was created, to undo them
+        self._played: list[int] = []
+
+    @property
+    def game_over(self) -> bool:
+        return self.won or not self.empty_bits
+
+    def score(self) -> int:
+        # Function that evaluates a finished game for the player to move.
+        # Output: -1 if the player who just moved won, 0 for a tie
+        return -1 if self.won else 0
+
+    def push(self, index: int) -> None:
+        # Function that plays the player to move in an empty cell. The game
+        # must not be over.
+        # Input: the index of the cell
+        # Output: None
+        moved_bits = self.mover_bits | 1 << index
+        self.mover_bits = self.other_bits
+        self.other_bits = moved_bits
+        self.empty_bits ^= 1 << index
+        self.won = WINNING_BOARDS[moved_bits]
+        self.x_to_move = not self.x_to_move
+        self._played.append(index)
+
+    def pop(self) -> int:
+        # Function that takes back the last move played with push.
+        # Output: the index of the cell of that move
+        index = self._played.pop()
+        self.mover_bits, self.other_bits = (
+            self.other_bits & ~(1 << index), self.mover_bits
+        )
+        self.empty_bits |= 1 << index
+        # a move is only pushed on a game that is not over
+        self.won = False
+        self.x_to_move = not self.x_to_move
+        return index
+
+    def to_state(self) -> GameState:
+        # Function that builds the immutable state of the board.
+        # Output: the GameState with the same cells and starting Mark
+        if self.x_to_move:
+            grid = Grid.from_bits(self.mover_bits, self.other_bits)
+        else:
+            grid = Grid.from_bits(self.other_bits, self.mover_bits)
+        if get_validation_policy() is ValidationPolicy.FULL:
+            return GameState(grid, self.starting_mark)
+        return GameState.trusted(grid, self.starting_mark)
@@ -0,0 +1,60 @@
+# tic_tac_toe/logic/interning.py
+
+import weakref
+from typing import Any, Hashable, MutableMapping
+
+
+class InternPool:
+    # A pool of canonical instances, indexed by a key that identifies the
+    # value of the instance (for a game state, its cells and starting mark).
+    # Since our models are immutable, two instances with the same key are
+    # interchangeable, and we can hand out the same shared instance every
+    # time. Everything cached on that instance is then computed only once.
+    # The pool can be bounded with maxsize: once it is full, new instances
+    # are still created but not stored. It can be emptied with clear().
+    # A weak pool only references its instances weakly: an instance that is
+    # no longer used anywhere else is freed and leaves the pool, so the pool
+    # never keeps a whole search tree alive. Instances stay shared as long
+    # as they are in use.
+    def __init__(self, maxsize: int | None = None, weak: bool = False) -> None:
+        self.maxsize = maxsize
+        self.weak = weak
+        self._instances: MutableMapping[Hashable, Any] = (
+            weakref.WeakValueDictionary() if weak else {}
+        )
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+    def get(self, key: Hashable) -> Any | None:
+        # Input: the key of an instance
+        # Output: the canonical instance for that key, or None
+        return self._instances.get(key)
+
+    def add(self, key: Hashable, instance: Any) -> None:
+        # Function that stores an instance as the canonical one for its key,
+        # unless the pool is full.
+        # Input: the key and the instance
+        # Output: None
+        if self.maxsize is None or len(self._instances) < self.maxsize:
+            self._instances[key] = instance
+
+    def clear(self) -> None:
+        # Function that forgets every canonical instance. Instances already
+        # handed out stay valid, they are just no longer shared.
+        self._instances.clear()
+
+
+class Interned(type):
+    # Metaclass that makes the construction of a class go through its pool.
+    # The class must define a "pool" class attribute (an InternPool) and an
+    # "intern_key" static method taking the same arguments as the
+    # constructor. If an instance with the same key already exists, it is
+    # returned as is, without running __init__ and __post_init__ again.
+    def __call__(cls, *args, **kwargs):
+        key = cls.intern_key(*args, **kwargs)
+        instance = cls.pool.get(key)
+        if instance is None:
+            instance = super().__call__(*args, **kwargs)
+            cls.pool.add(key, instance)
+        return instance
@@ -1,24 +1,259 @@
 # tic_tac_toe/logic/minimax.py
 
+import time
+from dataclasses import dataclass
 from functools import partial
+from itertools import chain
+from typing import Callable, Iterable, Iterator, NamedTuple, TypeAlias
 
-from tic_tac_toe_ai_player.logic.models import GameState, Mark, Move
+from tic_tac_toe_ai_player.logic.board import SearchBoard
+from tic_tac_toe_ai_player.logic.models import (
+    CELLS_OF_MASK,
+    WINNING_MASKS,
+    GameState,
+    Mark,
+    Move,
+)
+from tic_tac_toe_ai_player.logic.symmetry import (
+    INVERSES,
+    SYMMETRIES,
+    canonical_bits,
+)
+from tic_tac_toe_ai_player.logic.tablebase import Tablebase
+from tic_tac_toe_ai_player.logic.transpositions import (
+    Bound,
+    Entry,
+    TranspositionTable,
+    position_key,
+)
 
+# A move ordering takes a game state that is not over and returns its
+# possible moves in the order the search should try them. Good moves first
+# means earlier cutoffs for the alpha-beta search.
+MoveOrdering: TypeAlias = Callable[[GameState], Iterable[Move]]
 
-def find_best_move(game_state: GameState) -> Move | None:
+# Cells from the most to the least valuable: the center is on 4 winning
+# patterns, the corners on 3 and the edges on 2.
+CENTER_CORNERS_EDGES = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+
+@dataclass
+class SearchStats:
+    # Counters filled by a search, to see how much work it did.
+    # nodes: number of game states visited
+    # terminals: number of visited states where the game was over
+    # cache_hits, cache_misses: lookups in the transposition table
+    # max_depth: the deepest state visited, in moves from the searched state
+    # expanded: number of states whose moves were searched
+    # moves: number of moves searched from those states
+    # wall_time: duration of the search in seconds
+    # cpu_time: CPU time of the thread that searched, in seconds
+    nodes: int = 0
+    terminals: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    max_depth: int = 0
+    expanded: int = 0
+    moves: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+
+    @property
+    def branching_factor(self) -> float:
+        # The average number of moves searched from a state: much lower
+        # than the number of possible moves when the pruning works well.
+        return self.moves / self.expanded if self.expanded else 0.0
+
+    def add(self, other: "SearchStats") -> None:
+        # Function that adds the counters of another search to these ones,
+        # to follow the work of several searches (a whole game, for
+        # example). The maximum depth is the deepest of the two.
+        # Input: the SearchStats of another search
+        # Output: None
+        for name, value in vars(other).items():
+            if name == "max_depth":
+                self.max_depth = max(self.max_depth, value)
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self) -> dict[str, int | float]:
+        # Output: the counters and the branching factor, for exporters
+        return {**vars(self), "branching_factor": self.branching_factor}
+
+
+class SearchResult(NamedTuple):
+    # The answer of a search with a deadline (see search).
+    # move: the best move found, None if the game is over
+    # score: its score for the player who moves, exact if proven, a
+    # heuristic estimate otherwise
+    # depth: the depth of the last search that finished, in moves
+    # proven: True if the score is the real score of the position, with
+    # perfect play from both sides
+    move: Move | None
+    score: float
+    depth: int
+    proven: bool
+
+
+class SearchTimeout(Exception):
+    # Raised inside the search when the deadline has passed.
+    pass
+
+
+def cell_order(game_state: GameState) -> Iterator[Move]:
+    # Move ordering that keeps the moves in cell order, like possible_moves.
+    return game_state.iter_moves()
+
+
+def center_corners_edges(game_state: GameState) -> Iterator[Move]:
+    # Move ordering that tries the center first, then the corners, then the
+    # edges.
+    if game_state.game_over:
+        return
+    empty_bits = game_state.grid.empty_bits
+    for index in CENTER_CORNERS_EDGES:
+        if empty_bits >> index & 1:
+            yield Move(game_state.current_mark, index, game_state)
+
+
+# The searches play their moves on a SearchBoard (see board.py), and only
+# the moves they return are Move objects. A move ordering is a function of a
+# GameState, so under the first level they would have to build a state for
+# each node to call it. The orderings of this module always try the cells
+# in the same order, listed here, and are applied to the board directly;
+# other orderings still get a state.
+STATIC_ORDERINGS: dict[MoveOrdering, tuple[int, ...]] = {
+    cell_order: tuple(range(9)),
+    center_corners_edges: CENTER_CORNERS_EDGES,
+}
+
+
+def _cells_to_try(
+    board: SearchBoard, ordering: MoveOrdering, first_cell: int | None
+) -> Iterable[int]:
+    # Function that lists the cells a search tries on a board, in the order
+    # of the ordering, with first_cell (the best cell stored in the
+    # transposition table) first if there is one. The cells of a static
+    # ordering are not filtered: the caller skips the cells that are taken.
+    # Input: the board, the ordering and an optional first cell
+    # Output: the cells
+    cells = STATIC_ORDERINGS.get(ordering)
+    if cells is None:
+        cells = [move.cell_index for move in ordering(board.to_state())]
+    if first_cell is not None:
+        cells = (first_cell, *(cell for cell in cells if cell != first_cell))
+    return cells
+
+
+def find_best_move(
+    game_state: GameState,
+    pruning: bool = True,
+    ordering: MoveOrdering = center_corners_edges,
+    stats: SearchStats | None = None,
+    table: TranspositionTable | None = None,
+    tablebase: Tablebase | None = None,
+    deadline: float | None = None,
+) -> Move | None:
     # Function that finds the best move from the current state of the game.
-    # Identifies a maximizer (the player who wants to find the best move) and
-    # calls the minimax function on every possible move using the partial
-    # factory. Then it returns the move with the highest score.
-    # Input: the current state of the game.
-    # Output: The move with the best score
-    maximizer: Mark = game_state.current_mark
-    bound_minimax = partial(minimax, maximizer=maximizer)
-    return max(game_state.possible_moves, key=bound_minimax)
+    # By default it uses the alpha-beta search: the moves are tried in the
+    # order given by the ordering function, the best score found so far is
+    # passed down as a bound, and the search stops as soon as a winning move
+    # is found since nothing can beat it. With pruning=False, it uses the
+    # plain minimax instead: it identifies a maximizer (the player who wants
+    # to find the best move), calls the minimax function on every possible
+    # move using the partial factory, and returns the move with the highest
+    # score. Both find a move with the same, best, score.
+    # With a transposition table, the alpha-beta search stores every state
+    # it solves in the table and reuses them, and a state already solved
+    # exactly is answered without searching.
+    # With a tablebase, positions found in it are answered with a lookup,
+    # and the search is only used for the others.
+    # With a deadline, the search is the iterative deepening of search, and
+    # the best move found in time is returned.
+    # Input: the current state of the game, the search options, an optional
+    # SearchStats to fill, an optional TranspositionTable, an optional
+    # Tablebase and an optional deadline (a time.monotonic() value).
+    # Output: The move with the best score, or None if there is no move
+    if deadline is not None:
+        return search(
+            game_state, deadline, None, ordering, stats, table, tablebase
+        ).move
+    if stats is None:
+        stats = SearchStats()
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    entry = None if tablebase is None else tablebase.lookup(game_state)
+    if entry is not None:
+        best_move = None
+        if entry.best_cells:
+            best_move = game_state.make_move_to(entry.best_cells[0])
+    elif pruning:
+        best_move = _root_alphabeta(game_state, ordering, stats, table)
+    else:
+        maximizer: Mark = game_state.current_mark
+        bound_minimax = partial(minimax, maximizer=maximizer, stats=stats)
+        moves = game_state.possible_moves
+        best_move = max(moves, key=bound_minimax, default=None)
+        if best_move is not None:
+            stats.expanded += 1
+            stats.moves += len(moves)
+    stats.wall_time += time.perf_counter() - start
+    stats.cpu_time += time.thread_time() - cpu_start
+    return best_move
+
+
+def _root_alphabeta(
+    game_state: GameState,
+    ordering: MoveOrdering,
+    stats: SearchStats,
+    table: TranspositionTable | None,
+) -> Move | None:
+    # The first level of the alpha-beta search, which keeps track of the
+    # best move and not only of the best score. A finished game has no
+    # move, and the ordering is never called on it.
+    if game_state.game_over:
+        return None
+    key = None
+    if table is not None:
+        key = position_key(game_state)
+        entry = table.get(key.key)
+        if entry is None:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+            if entry.bound is Bound.EXACT:
+                return game_state.make_move_to(
+                    key.from_canonical(entry.best_cell)
+                )
+    board = SearchBoard(game_state)
+    best_move = None
+    best_score = alpha = -1
+    stats.expanded += 1
+    for move in ordering(game_state):
+        stats.moves += 1
+        board.push(move.cell_index)
+        score = -_alphabeta(board, -1, -alpha, ordering, stats, table, 1)
+        board.pop()
+        if best_move is None or score > best_score:
+            best_move, best_score = move, score
+            alpha = max(alpha, score)
+        if best_score == 1:
+            break
+    if key is not None and best_move is not None:
+        table.put(
+            key.key,
+            Entry(
+                best_score, Bound.EXACT, key.to_canonical(best_move.cell_index)
+            ),
+        )
+    return best_move
 
 
 def minimax(
-    move: Move, maximizer: Mark, choose_highest_score: bool = False
+    move: Move,
+    maximizer: Mark,
+    choose_highest_score: bool = False,
+    stats: SearchStats | None = None,
+    depth: int = 1,
 ) -> int:
     # Recursive function that checks the consequences of a move. If the move
     # ends the game it returns the score for the player. If not, it calls
@@ -29,13 +264,404 @@ def minimax(
     # those three outcomes after the move. The choose_highest_score boolean
     # used to determine if the best score is the highest (player using the
     # minimax) or the lowest (oponent).
+    # This version explores the whole tree, and is kept to check the results
+    # of the faster searches.
     # Input: A move, which player we are playing as (maximizer) and a boolean
-    # to keep track of the future turn (choose_highest_score)
+    # to keep track of the future turn (choose_highest_score), an optional
+    # SearchStats and the depth of the state after the move
     # Output: the best score possible after the input move.
-    if move.after_state.game_over:
-        return move.after_state.evaluate_score(maximizer)
-    return (max if choose_highest_score else min)(
-        minimax(next_move, maximizer, not choose_highest_score)
-        for next_move in move.after_state.possible_moves
+    board = SearchBoard(move.before_state)
+    board.push(move.cell_index)
+    return _minimax(
+        board, move.mark == maximizer, choose_highest_score, stats, depth
     )
 
+
+def _minimax(
+    board: SearchBoard,
+    maximizer_moved: bool,
+    choose_highest_score: bool,
+    stats: SearchStats | None,
+    depth: int,
+) -> int:
+    # The recursion of minimax, on a search board. maximizer_moved tells
+    # whether the last move on the board was played by the maximizer.
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+    if board.won or not board.empty_bits:
+        if stats is not None:
+            stats.terminals += 1
+        if not board.won:
+            return 0
+        return 1 if maximizer_moved else -1
+    next_cells = CELLS_OF_MASK[board.empty_bits]
+    if stats is not None:
+        stats.expanded += 1
+        stats.moves += len(next_cells)
+    best_score = None
+    for index in next_cells:
+        board.push(index)
+        score = _minimax(
+            board,
+            not maximizer_moved,
+            not choose_highest_score,
+            stats,
+            depth + 1,
+        )
+        board.pop()
+        if (
+            best_score is None
+            or choose_highest_score and score > best_score
+            or not choose_highest_score and score < best_score
+        ):
+            best_score = score
+    return best_score
+
+
+def alphabeta(
+    game_state: GameState,
+    alpha: int = -1,
+    beta: int = 1,
+    ordering: MoveOrdering = center_corners_edges,
+    stats: SearchStats | None = None,
+    table: TranspositionTable | None = None,
+    depth: int = 0,
+) -> int:
+    # Recursive alpha-beta search. Same scores as minimax, but written from
+    # the point of view of the player whose turn it is (the "negamax" form):
+    # the score of a state for its current player is the opposite of the
+    # best score of the next states for the other player, so we do not need
+    # to switch between max and min.
+    # alpha is the score the current player is already sure to get
+    # elsewhere, and beta the score the opponent is already sure to limit
+    # them to. Once a move reaches beta, the opponent will never let the game
+    # come here, and the remaining moves can be skipped. The returned score
+    # is exact when it lies strictly between alpha and beta, and only a bound
+    # otherwise.
+    # With a transposition table, a stored score either answers directly or
+    # narrows the window, and the stored best move is tried first. The
+    # result is then stored with the kind of bound it is.
+    # Input: the state to evaluate, the window (alpha, beta), the move
+    # ordering, an optional SearchStats, an optional TranspositionTable and
+    # the depth of the state in the search.
+    # Output: the score of the state for its current player
+    if stats is None:
+        stats = SearchStats()
+    return _alphabeta(
+        SearchBoard(game_state), alpha, beta, ordering, stats, table, depth
+    )
+
+
+def _alphabeta(
+    board: SearchBoard,
+    alpha: int,
+    beta: int,
+    ordering: MoveOrdering,
+    stats: SearchStats,
+    table: TranspositionTable | None,
+    depth: int,
+) -> int:
+    # The recursion of alphabeta, on a search board. The key of a position
+    # in the transposition table is computed from the bitboards of the
+    # board, like position_key does for a GameState.
+    stats.nodes += 1
+    stats.max_depth = max(stats.max_depth, depth)
+    if board.won or not board.empty_bits:
+        stats.terminals += 1
+        return board.score()
+
+    first_cell = None
+    if table is not None:
+        original_alpha = alpha
+        key, symmetry = canonical_bits(board.mover_bits, board.other_bits)
+        entry = table.get(key)
+        if entry is None:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+            if entry.bound is Bound.EXACT:
+                return entry.score
+            if entry.bound is Bound.LOWER:
+                alpha = max(alpha, entry.score)
+            else:
+                beta = min(beta, entry.score)
+            if alpha >= beta:
+                return entry.score
+            first_cell = SYMMETRIES[symmetry][entry.best_cell]
+
+    stats.expanded += 1
+    best_score, best_cell = -1, None
+    empty_bits = board.empty_bits
+    for index in _cells_to_try(board, ordering, first_cell):
+        if not empty_bits >> index & 1:
+            continue
+        stats.moves += 1
+        board.push(index)
+        score = -_alphabeta(
+            board, -beta, -alpha, ordering, stats, table, depth + 1
+        )
+        board.pop()
+        if best_cell is None or score > best_score:
+            best_score, best_cell = score, index
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+    if table is not None:
+        if best_score <= original_alpha:
+            bound = Bound.UPPER
+        elif best_score >= beta:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        table.put(
+            key, Entry(best_score, bound, INVERSES[symmetry][best_cell])
+        )
+    return best_score
+
+
+def heuristic_score(game_state: GameState) -> float:
+    # Function that estimates the score of a state that is not over, for
+    # the player whose turn it is: the number of winning patterns still
+    # open for them (without any mark of the other player), minus the
+    # number still open for the other player. It is scaled to stay strictly
+    # between -1 and 1, so that a real win or loss always counts more.
+    # Input: a game state that is not over
+    # Output: its estimated score, between -8/9 and 8/9
+    grid = game_state.grid
+    return _heuristic_score(
+        grid.bits_of(game_state.current_mark),
+        grid.bits_of(game_state.current_mark.other),
+    )
+
+
+def _heuristic_score(mover_bits: int, other_bits: int) -> float:
+    # heuristic_score, from the bitboards of the player to move and of the
+    # other player.
+    balance = 0
+    for mask in WINNING_MASKS:
+        if not mask & other_bits:
+            balance += 1
+        if not mask & mover_bits:
+            balance -= 1
+    return balance / (len(WINNING_MASKS) + 1)
+
+
+def search(
+    game_state: GameState,
+    deadline: float | None = None,
+    max_depth: int | None = None,
+    ordering: MoveOrdering = center_corners_edges,
+    stats: SearchStats | None = None,
+    table: TranspositionTable | None = None,
+    tablebase: Tablebase | None = None,
+) -> SearchResult:
+    # Anytime version of find_best_move, for moves that must be decided
+    # within a time budget. It uses iterative deepening: alpha-beta searches
+    # limited to 1 move, then 2 moves, and so on, with heuristic_score for
+    # the states where the limit stops the search. Each search tries the
+    # best move of the previous one first. When the deadline passes, the
+    # running search is abandoned and the result of the last finished one
+    # is returned. A search that reached the end of every line it explored
+    # is proven: its score is exact and deeper searches are not needed.
+    # Positions in the tablebase, and positions solved exactly in the
+    # transposition table, are answered directly. Only proven scores are
+    # stored in the table, so it can be shared with find_best_move.
+    # Input: the current state of the game, an optional deadline (a
+    # time.monotonic() value), an optional maximum depth, and the options
+    # of find_best_move
+    # Output: a SearchResult. If the deadline passes before the first search
+    # is over, the first move of the ordering is returned, with depth 0.
+    if stats is None:
+        stats = SearchStats()
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        return _iterative_deepening(
+            game_state, deadline, max_depth, ordering, stats, table, tablebase
+        )
+    finally:
+        stats.wall_time += time.perf_counter() - start
+        stats.cpu_time += time.thread_time() - cpu_start
+
+
+def _iterative_deepening(
+    game_state: GameState,
+    deadline: float | None,
+    max_depth: int | None,
+    ordering: MoveOrdering,
+    stats: SearchStats,
+    table: TranspositionTable | None,
+    tablebase: Tablebase | None,
+) -> SearchResult:
+    full_depth = game_state.grid.empty_count
+    if game_state.game_over:
+        return SearchResult(
+            None, game_state.evaluate_score(game_state.current_mark), 0, True
+        )
+    entry = None if tablebase is None else tablebase.lookup(game_state)
+    if entry is not None:
+        return SearchResult(
+            game_state.make_move_to(entry.best_cells[0]),
+            entry.score,
+            full_depth,
+            True,
+        )
+    if table is not None:
+        key = position_key(game_state)
+        table_entry = table.get(key.key)
+        if table_entry is None:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+        if table_entry is not None and table_entry.bound is Bound.EXACT:
+            return SearchResult(
+                game_state.make_move_to(
+                    key.from_canonical(table_entry.best_cell)
+                ),
+                table_entry.score,
+                full_depth,
+                True,
+            )
+
+    result = SearchResult(next(iter(ordering(game_state))), 0.0, 0, False)
+    if max_depth is not None:
+        full_depth = min(full_depth, max_depth)
+    for depth in range(1, full_depth + 1):
+        try:
+            move, score, proven = _root_depth_limited(
+                game_state, depth, result.move.cell_index, deadline,
+                ordering, stats, table,
+            )
+        except SearchTimeout:
+            break
+        result = SearchResult(move, score, depth, proven)
+        if proven:
+            break
+    return result
+
+
+def _root_depth_limited(
+    game_state: GameState,
+    depth: int,
+    first_cell: int,
+    deadline: float | None,
+    ordering: MoveOrdering,
+    stats: SearchStats,
+    table: TranspositionTable | None,
+) -> tuple[Move, float, bool]:
+    # The first level of a depth-limited search, which tries first_cell
+    # first and keeps track of the best move.
+    moves = chain(
+        [Move(game_state.current_mark, first_cell, game_state)],
+        (
+            move
+            for move in ordering(game_state)
+            if move.cell_index != first_cell
+        ),
+    )
+    board = SearchBoard(game_state)
+    best_move, best_score, alpha, proven = None, -1.0, -1.0, True
+    stats.expanded += 1
+    for move in moves:
+        stats.moves += 1
+        board.push(move.cell_index)
+        score, child_proven = _depth_limited(
+            board, depth - 1, -1.0, -alpha, deadline,
+            ordering, stats, table, 1,
+        )
+        board.pop()
+        score = -score
+        proven = proven and child_proven
+        if best_move is None or score > best_score:
+            best_move, best_score = move, score
+            alpha = max(alpha, score)
+        if best_score == 1:
+            break
+    if proven and table is not None:
+        key = position_key(game_state)
+        table.put(
+            key.key,
+            Entry(
+                int(best_score),
+                Bound.EXACT,
+                key.to_canonical(best_move.cell_index),
+            ),
+        )
+    return best_move, best_score, proven
+
+
+def _depth_limited(
+    board: SearchBoard,
+    depth: int,
+    alpha: float,
+    beta: float,
+    deadline: float | None,
+    ordering: MoveOrdering,
+    stats: SearchStats,
+    table: TranspositionTable | None,
+    ply: int,
+) -> tuple[float, bool]:
+    # Recursive depth-limited alpha-beta search on a search board, in the
+    # negamax form of alphabeta. The states at depth 0 get their heuristic
+    # score, and ply is the depth of the state in the search, for the
+    # statistics.
+    # Output: the score of the state for its current player, and whether
+    # it is proven (no heuristic score was used to compute it)
+    stats.nodes += 1
+    stats.max_depth = max(stats.max_depth, ply)
+    if deadline is not None and time.monotonic() >= deadline:
+        raise SearchTimeout
+    if board.won or not board.empty_bits:
+        stats.terminals += 1
+        return board.score(), True
+    if depth == 0:
+        return _heuristic_score(board.mover_bits, board.other_bits), False
+
+    first_cell = None
+    if table is not None:
+        original_alpha = alpha
+        key, symmetry = canonical_bits(board.mover_bits, board.other_bits)
+        entry = table.get(key)
+        if entry is None:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+            if entry.bound is Bound.EXACT:
+                return entry.score, True
+            first_cell = SYMMETRIES[symmetry][entry.best_cell]
+
+    stats.expanded += 1
+    best_score, best_cell, proven = -1.0, None, True
+    empty_bits = board.empty_bits
+    for index in _cells_to_try(board, ordering, first_cell):
+        if not empty_bits >> index & 1:
+            continue
+        stats.moves += 1
+        board.push(index)
+        score, child_proven = _depth_limited(
+            board, depth - 1, -beta, -alpha, deadline,
+            ordering, stats, table, ply + 1,
+        )
+        board.pop()
+        score = -score
+        proven = proven and child_proven
+        if best_cell is None or score > best_score:
+            best_score, best_cell = score, index
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+    if proven and table is not None:
+        if best_score <= original_alpha:
+            bound = Bound.UPPER
+        elif best_score >= beta:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        table.put(
+            key, Entry(int(best_score), bound, INVERSES[symmetry][best_cell])
+        )
+    return best_score, proven
@@ -3,14 +3,23 @@
 import enum
 from dataclasses import dataclass
 import random
-import re
-from functools import cached_property
+from typing import ClassVar, Iterator, NamedTuple
 
 from tic_tac_toe_ai_player.logic.exceptions import ( 
     InvalidMove,
     UnknownGameScore
     )
+from tic_tac_toe_ai_player.logic.interning import InternPool, Interned
+from tic_tac_toe_ai_player.logic.symmetry import (
+    BIT_TRANSFORMS,
+    INVERSES,
+    SYMMETRIES,
+    PositionKey,
+    canonical_bits,
+)
 from tic_tac_toe_ai_player.logic.validators import (
+    ValidationPolicy,
+    get_validation_policy,
     validate_game_state,
     validate_grid
     )
@@ -30,6 +39,47 @@ WINNING_PATTERNS = (
     "..?.?.?..",
 )
 
+# Bitboard version of the winning patterns. Each side of the grid can be
+# represented as a 9-bit integer where bit i is set when cell i holds that
+# side's Mark. A winning pattern then becomes a mask, and checking it is a
+# single "&" instead of a regex match.
+WINNING_MASKS = tuple(
+    sum(1 << index for index, char in enumerate(pattern) if char == "?")
+    for pattern in WINNING_PATTERNS
+)
+
+# Mask with the 9 cells of the grid set.
+FULL_MASK = (1 << 9) - 1
+
+# Lookup tables indexed by a 9-bit board, precomputed once for the 512
+# possible boards of one side:
+# - WINNING_BOARDS[bits] is True when the cells in bits contain a winning
+#   pattern.
+# - CELLS_OF_MASK[bits] is the tuple of cell indexes set in bits, in order.
+WINNING_BOARDS = tuple(
+    any(bits & mask == mask for mask in WINNING_MASKS)
+    for bits in range(FULL_MASK + 1)
+)
+CELLS_OF_MASK = tuple(
+    tuple(index for index in range(9) if bits >> index & 1)
+    for bits in range(FULL_MASK + 1)
+)
+
+# Position codes. A position, its cells and its starting mark, is packed in
+# a 16-bit integer: the cells as a base-3 number, cell i being the digit i
+# with 0 for an empty cell, 1 for X and 2 for O, plus CODES_PER_MARK when O
+# starts. Codes go from 0 to 2 * 3^9 - 1 = 39365, and never change: the
+# tablebase indexes its records by code, the batch functions of batch.py
+# use the same digits, and a state can be rebuilt from its code (see
+# GameState.to_code and GameState.from_code).
+CODES_PER_MARK = 3 ** 9
+# TERNARY[bits] is the base-3 number of a 9-bit board with digits of 1, so
+# the base-3 number of a grid is TERNARY[x_bits] + 2 * TERNARY[o_bits].
+TERNARY = tuple(
+    sum(3 ** index for index in CELLS_OF_MASK[bits])
+    for bits in range(FULL_MASK + 1)
+)
+
 
 class Mark(enum.StrEnum):
     # The enum to manage the Marks available to the players
@@ -44,88 +94,405 @@ class Mark(enum.StrEnum):
         return Mark.CROSS if self is Mark.NAUGHT else Mark.NAUGHT
 
 
-@dataclass(frozen=True)
-class Grid:
+def position_code(x_bits: int, o_bits: int, starting_mark: Mark) -> int:
+    # Input: the bitboards and starting mark of a position
+    # Output: the code of the position
+    offset = 0 if starting_mark == Mark.CROSS else CODES_PER_MARK
+    return offset + TERNARY[x_bits] + 2 * TERNARY[o_bits]
+
+
+def decode_position(code: int) -> tuple[int, int, Mark]:
+    # Function that unpacks a position code. Any code in the range gives a
+    # position, even one no game can reach: the caller validates it.
+    # Input: a position code
+    # Output: the bitboards of the X and O Marks, and the starting mark
+    if not 0 <= code < 2 * CODES_PER_MARK:
+        raise ValueError(
+            f"Position codes go from 0 to {2 * CODES_PER_MARK - 1}"
+        )
+    starting_mark = Mark.CROSS if code < CODES_PER_MARK else Mark.NAUGHT
+    code %= CODES_PER_MARK
+    x_bits = o_bits = 0
+    for index in range(9):
+        code, digit = divmod(code, 3)
+        if digit == 1:
+            x_bits |= 1 << index
+        elif digit == 2:
+            o_bits |= 1 << index
+    return x_bits, o_bits, starting_mark
+
+
+class _GridMemo:
+    # The memo fields of Grid. They live in the slots of this base class
+    # rather than in dataclass fields, so they are not part of the fields of
+    # the grid (dataclasses.fields, asdict, replace...), only of its layout.
+    # the 9-bit boards of the X Marks, the O Marks and the empty cells:
+    # bit i is set if cell i contains that Mark (or is empty)
+    x_bits: int
+    o_bits: int
+    empty_bits: int
+    # the number of X Marks, of O Marks and of empty cells
+    x_count: int
+    o_count: int
+    empty_count: int
+
+    __slots__ = (
+        "x_bits", "o_bits", "empty_bits", "x_count", "o_count", "empty_count"
+    )
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Grid(_GridMemo, metaclass=Interned):
     # The Grid on which the players will play.
     # It actually is a string of 9 characters that gets represented
     # as a grid when displayed. Spaces represent empty cells.
     # The Grid is immutable, so we will need to create new instances
-    # for each turn.
+    # for each turn. Grids are interned: building a Grid with the same cells
+    # as an existing one returns that existing instance (see interning.py).
     # Display will be handled in the fontend part of the project.
+    # Full-tree analyses hold millions of grids, so the class uses
+    # __slots__ instead of a per-instance __dict__. The bitboards and the
+    # counts are memo fields (see _GridMemo): they are computed once, when
+    # the grid is built, and are not part of its identity (repr, ==, hash).
     cells: str = " " * 9
 
+    pool: ClassVar[InternPool] = InternPool()
+
+    @staticmethod
+    def intern_key(cells: str = " " * 9) -> str:
+        return cells
+
+    def __reduce__(self) -> tuple:
+        # Grids are pickled as their cells, and interned again when they are
+        # unpickled. The memo fields are rebuilt.
+        return Grid, (self.cells,)
+
     def __post_init__(self) -> None:
         # Function that uses Regex on our cells to check if they contain a
-        # valid input
+        # valid input, then fills the memo fields.
         # Input: string representing our grid
         # Output: raises error if the input is anomalous
         # if not re.match(r"^[\sXO]{9}$", self.cells):
         # raise ValueError("Must contain 9 cells of: X, O, or space")
         validate_grid(self)
+        self._memoize(*bits_of_cells(self.cells))
 
-    @cached_property
-    def x_count(self) -> int:
-        # Function that counts the number of X Marks
-        # Input: the Cells string
-        # Output: the number of occurences of X in Cells
-        return self.cells.count("X")
-
-    @cached_property
-    def o_count(self) -> int:
-        # Function that counts the number of O Marks
-        # Input: the Cells string
-        # Output: the number of occurences of O in Cells
-        return self.cells.count("O")
-
-    @cached_property
-    def empty_count(self) -> int:
-        # Function that counts the number cells with no Marks
-        # Input: the Cells string
-        # Output: the number of occurences of the empty space character in
-        # the Cells string
-        return self.cells.count(" ")
-
-
-@dataclass(frozen=True)
-class Move:
+    def _memoize(self, x_bits: int, o_bits: int) -> None:
+        # Function that fills the memo fields from the bitboards.
+        empty_bits = FULL_MASK & ~(x_bits | o_bits)
+        object.__setattr__(self, "x_bits", x_bits)
+        object.__setattr__(self, "o_bits", o_bits)
+        object.__setattr__(self, "empty_bits", empty_bits)
+        object.__setattr__(self, "x_count", x_bits.bit_count())
+        object.__setattr__(self, "o_count", o_bits.bit_count())
+        object.__setattr__(self, "empty_count", empty_bits.bit_count())
+
+    @classmethod
+    def trusted(
+        cls, cells: str, x_bits: int | None = None, o_bits: int | None = None
+    ) -> "Grid":
+        # Trusted construction path: returns the interned grid for these
+        # cells without running validate_grid. Only for cells that are known
+        # to be valid, like the ones built by the engine itself. The
+        # bitboards, when given, must be the ones of the cells: they become
+        # the memo fields of the interned grid as they are.
+        # Input: a valid cells string, and its bitboards if they are known
+        # Output: a Grid
+        grid = cls.pool.get(cells)
+        if grid is None:
+            grid = object.__new__(cls)
+            object.__setattr__(grid, "cells", cells)
+            if x_bits is None or o_bits is None:
+                x_bits, o_bits = bits_of_cells(cells)
+            grid._memoize(x_bits, o_bits)
+            cls.pool.add(cells, grid)
+        return grid
+
+    @classmethod
+    def from_bits(cls, x_bits: int, o_bits: int) -> "Grid":
+        # Function that builds a grid from the bitboards of both sides. The
+        # cells string is derived from the bits, and the bitboards are used
+        # for the memo fields right away so they are not parsed back from the
+        # string. A string built this way can only contain X, O and spaces,
+        # so it goes through the trusted path unless the policy is FULL, once
+        # the bits are checked: the grid is interned with them as memo
+        # fields, so they must fit in 9 bits and not overlap.
+        # Input: the 9-bit boards of the X and O Marks
+        # Output: a Grid, or raises ValueError for bits that are not the
+        # ones of a grid
+        if x_bits & o_bits:
+            raise ValueError("A cell cannot hold both Marks")
+        if not (0 <= x_bits <= FULL_MASK and 0 <= o_bits <= FULL_MASK):
+            raise ValueError(f"Bitboards go from 0 to {FULL_MASK}")
+        cells = "".join(
+            "X" if x_bits >> index & 1 else "O" if o_bits >> index & 1
+            else " "
+            for index in range(9)
+        )
+        if get_validation_policy() is ValidationPolicy.FULL:
+            return cls(cells)
+        return cls.trusted(cells, x_bits, o_bits)
+
+    def bits_of(self, mark: Mark) -> int:
+        # Function that returns the bitboard of one of the Marks
+        # Input: a Mark
+        # Output: the 9-bit integer of the cells occupied by that Mark
+        return self.x_bits if mark == Mark.CROSS else self.o_bits
+
+
+def bits_of_cells(cells: str) -> tuple[int, int]:
+    # Function that builds the bitboards of the X and O Marks
+    # Input: the Cells string
+    # Output: two 9-bit integers where bit i is set if cell i contains X
+    # (first one) or O (second one)
+    x_bits = o_bits = 0
+    for index, char in enumerate(cells):
+        if char == "X":
+            x_bits |= 1 << index
+        elif char == "O":
+            o_bits |= 1 << index
+    return x_bits, o_bits
+
+
+def find_winning_mask(x_bits: int, o_bits: int) -> int:
+    # Function that finds the first winning pattern present on a grid.
+    # Patterns are checked in the order of WINNING_MASKS, and X before O
+    # for each pattern. The lookup table answers the common cases where
+    # at most one side has a winning pattern; the loop is only needed for
+    # the (invalid) grids where both sides have one.
+    # Input: the bitboards of the grid
+    # Output: the mask of the winning pattern, or 0 if there is none
+    if not (WINNING_BOARDS[x_bits] or WINNING_BOARDS[o_bits]):
+        return 0
+    for mask in WINNING_MASKS:
+        if x_bits & mask == mask or o_bits & mask == mask:
+            return mask
+    return 0
+
+
+class RetentionPolicy(enum.Enum):
+    # What a game state keeps of its children. possible_moves lists Move
+    # objects, and each Move caches the state after it, which has its own
+    # possible_moves... so a state that caches its moves keeps every state
+    # explored below it alive, for as long as it is itself referenced (and
+    # interned states are referenced by their pool).
+    # - RETAIN (the default) caches the moves: a state visited again, by
+    #   another search for example, reuses them, at the cost of memory.
+    # - DISCARD never caches them: children are freed as soon as the search
+    #   is done with them. Together with weak intern pools (see
+    #   set_intern_pools), the memory of a search is bounded by its depth.
+    RETAIN = "retain"
+    DISCARD = "discard"
+
+
+_retention_policy = RetentionPolicy.RETAIN
+
+
+def get_retention_policy() -> RetentionPolicy:
+    # Output: the current retention policy of the library
+    return _retention_policy
+
+
+def set_retention_policy(policy: RetentionPolicy) -> None:
+    # Function that changes the retention policy of the library. States that
+    # already cached their moves keep them.
+    # Input: the new policy
+    # Output: None
+    global _retention_policy
+    _retention_policy = RetentionPolicy(policy)
+
+
+class _MoveMemo:
+    # The memo field of Move (see _GridMemo): the state after the move, None
+    # until after_state is first read.
+    _after_state: "GameState | None"
+
+    __slots__ = ("_after_state",)
+
+
+@dataclass(frozen=True, slots=True)
+class Move(_MoveMemo):
     # Class that represents a move.
     # It models what Mark is placed and in what cell.
     # Note: this is a data transfer object, which is here to carry data
     # between two processes (here two instances of the GameState class)
+    # The state after the move is lazy: it is only built the first time
+    # after_state is read. Listing moves is then cheap, and a search that
+    # skips a move never pays for the state behind it.
     mark: Mark
     cell_index: int
     before_state: "GameState"
-    after_state: "GameState"
+
+    def __reduce__(self) -> tuple:
+        # Moves are pickled without the state after them, which would bring
+        # the states below it along (see GameState.__reduce__).
+        return Move, (self.mark, self.cell_index, self.before_state)
+
+    def __post_init__(self) -> None:
+        # Function that checks that the move is legal on the state before
+        # it. after_state builds the next state through the trusted path
+        # (see ValidationPolicy), so an illegal move must never get there.
+        # Then empties the memo field.
+        # Input: the move
+        # Output: raises InvalidMove if the move is not legal
+        before_state = self.before_state
+        if before_state.game_over:
+            raise InvalidMove("The game is over")
+        if self.mark != before_state.current_mark:
+            raise InvalidMove(f"It is not the turn of {self.mark}")
+        if not 0 <= self.cell_index < 9:
+            raise InvalidMove("Cell index must be between 0 and 8")
+        if not before_state.grid.empty_bits >> self.cell_index & 1:
+            raise InvalidMove("Cell is not empty")
+        object.__setattr__(self, "_after_state", None)
+
+    @property
+    def after_state(self) -> "GameState":
+        # Function that builds the state of the game after the move, from the
+        # bitboards of the state before the move, and memoizes it.
+        # Input: the move
+        # Output: the GameState after the move
+        state = self._after_state
+        if state is not None:
+            return state
+        grid = self.before_state.grid
+        bit = 1 << self.cell_index
+        if self.mark == Mark.CROSS:
+            grid = Grid.from_bits(grid.x_bits | bit, grid.o_bits)
+        else:
+            grid = Grid.from_bits(grid.x_bits, grid.o_bits | bit)
+        if get_validation_policy() is ValidationPolicy.FULL:
+            state = GameState(grid, self.before_state.starting_mark)
+        else:
+            state = GameState.trusted(grid, self.before_state.starting_mark)
+        object.__setattr__(self, "_after_state", state)
+        return state
+
+
+class _GameStateMemo:
+    # The memo fields of GameState (see _GridMemo).
+    # the Mark of the player whose turn it is
+    current_mark: Mark
+    # the mask of the winning pattern on the grid, or 0 if there is none
+    winning_mask: int
+    # the Mark of the winner, if there is one
+    winner: Mark | None
+    # whether there is a winner or a tie
+    game_over: bool
+    # memo field of possible_moves, None until it is first read (and
+    # always None under the DISCARD policy)
+    _possible_moves: list[Move] | None
+    # memo field of position_key, None until it is first read
+    _position_key: PositionKey | None
+
+    __slots__ = (
+        "current_mark",
+        "winning_mask",
+        "winner",
+        "game_over",
+        "_possible_moves",
+        "_position_key",
+    )
 
 
-@dataclass(frozen=True)
-class GameState:
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class GameState(_GameStateMemo, metaclass=Interned):
     # A class that represents the state of the game at a point in time.
     # It contains the grid, but also the starting Mark. The point of knowing
     # the starting mark is to be able to find whose turn it is in case there
     # is an equal number of "X" or "O".
     # Like the grid, this is an immutable object. After each move, the game is
     # in a new state, represented by a new GameState object.
+    # Game states are interned on their cells and starting mark: the same
+    # position reached through different paths is a single shared instance,
+    # so it is validated once and its memo fields (winner, possible_moves,
+    # ...) are computed once per process.
+    # Like Grid, the class uses __slots__, with the memo fields of
+    # _GameStateMemo. current_mark, winning_mask, winner and game_over are
+    # computed when the state is built, since every search reads them; the
+    # list of moves is computed on demand.
     grid: Grid
     starting_mark: Mark = Mark("X")
 
+    pool: ClassVar[InternPool] = InternPool()
+
+    @staticmethod
+    def intern_key(
+        grid: Grid, starting_mark: Mark = Mark("X")
+    ) -> tuple[str, Mark]:
+        # The starting mark is converted to a Mark: "O" and Mark.NAUGHT have
+        # the same key, so the pooled state must hold the Mark, whichever
+        # form its first caller passed.
+        return grid.cells, Mark(starting_mark)
+
+    def __reduce__(self) -> tuple:
+        # Game states are pickled as their code, instead of the graph of
+        # their memo fields (possible_moves and the states after them), and
+        # are validated and interned again when they are unpickled.
+        return GameState.from_code, (self.to_code(),)
+
     def __post_init__(self) -> None:
-        # Function that checks if the GameSate is valid.
+        # Function that converts the starting mark to a Mark (see
+        # intern_key), fills the memo fields, then checks if the GameSate is
+        # valid.
         # Input: Current state of the game.
         # Output: raises error if the input is anomalous
+        object.__setattr__(self, "starting_mark", Mark(self.starting_mark))
+        self._memoize()
         validate_game_state(self)
 
-    @cached_property
-    def current_mark(self) -> Mark:
-        # Function that finds out who's turn it is.
-        # Input: the current state of the game
-        # Output: the next player to play, defined by their Mark
-        if self.grid.x_count == self.grid.o_count:
-            return self.starting_mark
+    @classmethod
+    def trusted(
+        cls, grid: Grid, starting_mark: Mark = Mark("X")
+    ) -> "GameState":
+        # Trusted construction path: returns the interned state for this grid
+        # and starting mark without running validate_game_state. Used for the
+        # states derived from a valid state by a legal move (see
+        # ValidationPolicy in validators.py). Anything coming from outside the
+        # engine must use the normal constructor.
+        # Input: a grid and a starting mark that are known to be valid
+        # Output: a GameState
+        starting_mark = Mark(starting_mark)
+        key = (grid.cells, starting_mark)
+        state = cls.pool.get(key)
+        if state is None:
+            state = object.__new__(cls)
+            object.__setattr__(state, "grid", grid)
+            object.__setattr__(state, "starting_mark", starting_mark)
+            state._memoize()
+            cls.pool.add(key, state)
+        return state
+
+    def _memoize(self) -> None:
+        # Function that fills the memo fields from the grid. The lazy ones
+        # (possible_moves, position_key) are emptied.
+        # current_mark: whose turn it is. The starting Mark plays when both
+        # Marks have been played the same number of times.
+        # winner: the side whose bitboard covers the winning pattern.
+        # game_over: True when there is a winner, or when all cells are
+        # occupied (a tie).
+        grid = self.grid
+        if grid.x_count == grid.o_count:
+            current_mark = self.starting_mark
+        else:
+            current_mark = self.starting_mark.other
+        mask = find_winning_mask(grid.x_bits, grid.o_bits)
+        if not mask:
+            winner = None
+        elif grid.x_bits & mask == mask:
+            winner = Mark.CROSS
         else:
-            return self.starting_mark.other
+            winner = Mark.NAUGHT
+        object.__setattr__(self, "current_mark", current_mark)
+        object.__setattr__(self, "winning_mask", mask)
+        object.__setattr__(self, "winner", winner)
+        object.__setattr__(
+            self, "game_over", winner is not None or grid.empty_count == 0
+        )
+        object.__setattr__(self, "_possible_moves", None)
+        object.__setattr__(self, "_position_key", None)
 
-    @cached_property
+    @property
     def game_not_started(self) -> bool:
         # Function that signals that the game has not started and flags the
         # current state of the game as the initial state.
@@ -134,17 +501,7 @@ class GameState:
         # if at least one cell is occupied by a Mark.
         return self.grid.empty_count == 9
 
-    @cached_property
-    def game_over(self) -> bool:
-        # Function that detects when the game is finished by identifying when
-        # there is a winner or a tie.
-        # Input: Current state of the game
-        # Output: A boolean that is True when all cells are occupied or there
-        # is a winner and False if at least one cell is not occupied by a Mark
-        # and there is no winner.
-        return self.winner is not None or self.tie
-
-    @cached_property
+    @property
     def tie(self) -> bool:
         # Function that detects ties and flags the current state of the game
         # as a tie.
@@ -154,76 +511,146 @@ class GameState:
         # a Mark or if there is a winner.
         return self.winner is None and self.grid.empty_count == 0
 
-    @cached_property
-    def winner(self) -> Mark | None:
-        # Function that identifies a winner in the current state of the Game
-        # and returns their Mark. Iterates over every winning pattern,
-        # replaces the "?" placeholders with each marks, and checks if the
-        # pattern matches the current state of the game.
-        # Input: Current state of the game and global variable WINNING_PATTERNS
-        # Output: the Mark of the winner
-        for pattern in WINNING_PATTERNS:
-            for mark in Mark:
-                if re.match(pattern.replace("?", mark), self.grid.cells):
-                    return mark
-        return None
-
-    @cached_property
+    @property
     def winning_cells(self) -> list[int]:
-        # Identifies the winning cells. Iterates over every pattern and mark.
-        # When a winning pattern is encountered, identifies its cells and
-        # returns their indexes (?) as a list.
-        # Input: Current state of the game and global variable WINNING_PATTERNS
+        # Identifies the winning cells, the indexes of the cells in the
+        # winning pattern.
+        # Input: Current state of the game
         # Output: a list of indexes of the winning cells.
-        for pattern in WINNING_PATTERNS:
-            for mark in Mark:
-                if re.match(pattern.replace("?", mark), self.grid.cells):
-                    return [
-                        match.start()
-                        for match in re.finditer(r"\?", pattern)
-                    ]
-        return []
-
-    @cached_property
+        return list(CELLS_OF_MASK[self.winning_mask])
+
+    @property
+    def empty_cells(self) -> tuple[int, ...]:
+        # Function that lists the indexes of the empty cells, in order.
+        # Input: the bitboard of the empty cells
+        # Output: a tuple of cell indexes
+        return CELLS_OF_MASK[self.grid.empty_bits]
+
+    @property
     def possible_moves(self) -> list[Move]:
         # Function that lists all of the possible moves for this round.
+        # Under the RETAIN policy, the list is cached on the state, and with
+        # it the states after the moves once they are built (see
+        # RetentionPolicy). Under the DISCARD policy, a new list is built on
+        # every call, and the state keeps nothing.
         # Input: the current state of the game
         # Output: a list of moves, in the form of cell indexes (?)
-        moves = []
-        if not self.game_over:
-            for match in re.finditer(r"\s", self.grid.cells):
-                moves.append(self.make_move_to(match.start()))
+        moves = self._possible_moves
+        if moves is None:
+            moves = list(self.iter_moves())
+            if _retention_policy is RetentionPolicy.RETAIN:
+                object.__setattr__(self, "_possible_moves", moves)
         return moves
 
+    def to_code(self) -> int:
+        # Output: the position code of the state (see CODES_PER_MARK)
+        return position_code(
+            self.grid.x_bits, self.grid.o_bits, self.starting_mark
+        )
+
+    @classmethod
+    def from_code(cls, code: int) -> "GameState":
+        # Function that rebuilds a state from its position code. The state
+        # is validated, since the code may come from outside the engine.
+        # Input: a position code
+        # Output: the GameState, or raises ValueError for a code out of the
+        # range and InvalidGameState for a position no game can reach
+        x_bits, o_bits, starting_mark = decode_position(code)
+        return cls(Grid.from_bits(x_bits, o_bits), starting_mark)
+
+    def position_key(self) -> PositionKey:
+        # Function that finds the orientation of the state that is used as
+        # its canonical representative: among the 8 symmetric versions of
+        # the grid, the one whose bitboards of the player to move and of the
+        # other player pack to the smallest value (see canonical_bits). Two
+        # positions that are the same up to a symmetry, or up to swapping
+        # the Marks of both players, have the same key. The key is computed
+        # once per state.
+        # Input: the current state of the game
+        # Output: the packed canonical bitboards and the symmetry, as a
+        # PositionKey
+        key = self._position_key
+        if key is None:
+            grid = self.grid
+            key = PositionKey(*canonical_bits(
+                grid.bits_of(self.current_mark),
+                grid.bits_of(self.current_mark.other),
+            ))
+            object.__setattr__(self, "_position_key", key)
+        return key
+
+    def transformed(self, symmetry: int) -> "GameState":
+        # Function that builds the image of the state by a symmetry. Cell i
+        # of the new grid is cell SYMMETRIES[symmetry][i] of this one.
+        # Input: the index of a symmetry in SYMMETRIES
+        # Output: a GameState with the same starting Mark
+        if symmetry == 0:
+            return self
+        transform = BIT_TRANSFORMS[symmetry]
+        grid = Grid.from_bits(
+            transform[self.grid.x_bits], transform[self.grid.o_bits]
+        )
+        if get_validation_policy() is ValidationPolicy.FULL:
+            return GameState(grid, self.starting_mark)
+        return GameState.trusted(grid, self.starting_mark)
+
+    def canonical(self) -> "Canonical":
+        # Function that returns the canonical representative of the state,
+        # the orientation chosen by position_key, with the symmetry that
+        # turns this state into it. Caches and analyses can then store one
+        # entry for the 8 symmetric versions of a position.
+        # Example, to play a move found on the canonical state:
+        #     canonical = game_state.canonical()
+        #     move = game_state.move_from_canonical(find(canonical.state))
+        # Input: the current state of the game
+        # Output: a Canonical
+        symmetry = self.position_key().symmetry
+        return Canonical(self.transformed(symmetry), symmetry)
+
+    def move_from_canonical(self, move: Move) -> Move:
+        # Function that maps a move made on the canonical state back to the
+        # orientation of this state.
+        # Input: a move whose before_state is self.canonical().state
+        # Output: the same move on this state
+        canonical = self.canonical()
+        if move.before_state != canonical.state:
+            raise ValueError("The move is not made on the canonical state")
+        return self.make_move_to(canonical.from_canonical(move.cell_index))
+
+    def iter_moves(self) -> Iterator[Move]:
+        # Generator version of possible_moves. Moves are created one at a
+        # time as the caller asks for them, and nothing is cached, so a
+        # caller that stops early (like a pruned search) never creates the
+        # remaining moves.
+        # Input: the current state of the game
+        # Output: an iterator over the possible moves, in cell order
+        if not self.game_over:
+            for index in self.empty_cells:
+                yield Move(self.current_mark, index, self)
+
     def make_random_move(self) -> Move | None:
-        # Function that takes all possible moves from the game state and
-        # returns one of them randomly.
+        # Function that picks one of the empty cells randomly and returns the
+        # move to that cell. Only that move is created.
         # Input: The current state of the game
-        # Output: A move
-        try:
-            return random.choice(self.possible_moves)
-        except IndexError:
+        # Output: A move, or None if there is no possible move
+        if self.game_over or not self.empty_cells:
             return None
+        return self.make_move_to(random.choice(self.empty_cells))
 
     def make_move_to(self, index: int) -> Move:
         # Fonction that takes the current state of the game and the index of a
         # cell to make the move of the turn in that cell.
         # Input: The current state of the game and an index for the cell
         # Output: an instance of the Move class
+        # The state after the move is built lazily by Move.after_state.
+        if not 0 <= index < 9:
+            raise InvalidMove("Cell index must be between 0 and 8")
         if self.grid.cells[index] != " ":
             raise InvalidMove("Cell is not empty")
         return Move(
             mark=self.current_mark,
             cell_index=index,
             before_state=self,
-            after_state=GameState(
-                Grid(
-                    self.grid.cells[:index]
-                    + self.current_mark
-                    + self.grid.cells[index + 1:]
-                ),
-                self.starting_mark,
-            ),
         )
     
     def evaluate_score(self, mark: Mark) -> int:
@@ -240,3 +667,41 @@ class GameState:
             else:
                 return -1
         raise UnknownGameScore("Game is not over yet")
+
+
+class Canonical(NamedTuple):
+    # The canonical representative of a game state (see
+    # GameState.canonical), and the index in SYMMETRIES of the symmetry
+    # that turns the original state into it.
+    state: GameState
+    symmetry: int
+
+    def to_canonical(self, cell_index: int) -> int:
+        # Input: a cell index on the original grid
+        # Output: the same cell on the canonical grid
+        return INVERSES[self.symmetry][cell_index]
+
+    def from_canonical(self, cell_index: int) -> int:
+        # Input: a cell index on the canonical grid
+        # Output: the same cell on the original grid
+        return SYMMETRIES[self.symmetry][cell_index]
+
+
+def clear_interned() -> None:
+    # Function that empties the pools of canonical grids and game states, for
+    # example to release memory after a large analysis.
+    Grid.pool.clear()
+    GameState.pool.clear()
+
+
+def set_intern_pools(maxsize: int | None = None, weak: bool = False) -> None:
+    # Function that replaces the pools of canonical grids and game states by
+    # new, empty ones (see InternPool). Instances already handed out stay
+    # valid, they are just no longer shared with the new ones.
+    # Example, for a search whose memory must not grow with the tree:
+    #     set_intern_pools(weak=True)
+    #     set_retention_policy(RetentionPolicy.DISCARD)
+    # Input: the maximum size of each pool, and whether they are weak
+    # Output: None
+    Grid.pool = InternPool(maxsize, weak)
+    GameState.pool = InternPool(maxsize, weak)
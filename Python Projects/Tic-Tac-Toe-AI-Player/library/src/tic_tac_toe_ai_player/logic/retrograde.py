@@ -0,0 +1,218 @@
+# tic_tac_toe/logic/retrograde.py
+
+import argparse
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from tic_tac_toe_ai_player.logic.models import TERNARY, GameState, Mark
+
+# Retrograde solver: solves every position of an m,n,k-game (a grid of rows
+# x columns where k marks in a row, a column or a diagonal win; tic-tac-toe
+# is the 3,3,3-game) by backward induction over the whole state graph, with
+# NumPy instead of recursion. Needs the numpy extra.
+#
+# 1. The positions are enumerated layer by layer: layer t holds the
+#    positions with t marks on the grid. The successors of the positions of
+#    a layer that are not over are computed at once, and become the next
+#    layer. A position is a base-3 code like the position codes of
+#    models.py (cell i is the digit i, 1 for the first player, 2 for the
+#    second one); the first player is always 1, since a game where O starts
+#    is the same game with the marks swapped.
+# 2. The successor graph is kept in CSR form (compressed sparse rows): the
+#    successors of position i are indices[indptr[i]:indptr[i + 1]].
+# 3. Values are assigned from the last layer back to the first: a position
+#    that is over is worth -1 for the player to move if the other player
+#    just won and 0 otherwise, and any other position is worth the opposite
+#    of the smallest value of its successors. The smallest values of all
+#    the positions of a layer are one np.minimum.reduceat over the values
+#    of their successors.
+#
+# From the frontends folder, or with the library installed:
+# python -m tic_tac_toe_ai_player.logic.retrograde --rows 3 --columns 4 --k 3
+
+# Codes are int64, so a grid can have at most 39 cells (3^40 > 2^63).
+MAX_CELLS = 39
+
+# Directions of the lines, as (row step, column step): rows, columns, and
+# both diagonals.
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class RetrogradeSolution(NamedTuple):
+    # The complete value table of an m,n,k-game.
+    # codes: the code of every reachable position, layer by layer, sorted
+    # within each layer
+    # layers: positions with t marks are codes[layers[t]:layers[t + 1]]
+    # indptr, indices: the successor graph in CSR form, with indexes into
+    # codes. Positions where the game is over have no successor.
+    # values: the score of every position for the player to move, with
+    # perfect play from both sides (1, 0 or -1)
+    rows: int
+    columns: int
+    k: int
+    codes: np.ndarray
+    layers: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    values: np.ndarray
+
+    def index(self, code: int) -> int | None:
+        # Input: the code of a position
+        # Output: its index in codes, or None if no game can reach it
+        marks, rest = 0, code
+        while rest:
+            rest, digit = divmod(rest, 3)
+            marks += digit != 0
+        if marks >= len(self.layers) - 1:
+            return None
+        start, stop = self.layers[marks], self.layers[marks + 1]
+        index = int(start + np.searchsorted(self.codes[start:stop], code))
+        if index == stop or self.codes[index] != code:
+            return None
+        return index
+
+    def value(self, code: int) -> int | None:
+        # Input: the code of a position
+        # Output: its value for the player to move, or None if no game can
+        # reach it
+        index = self.index(code)
+        return None if index is None else int(self.values[index])
+
+    def best_successors(self, index: int) -> np.ndarray:
+        # Input: the index of a position
+        # Output: the indexes of its successors that keep its value
+        successors = self.indices[self.indptr[index]:self.indptr[index + 1]]
+        return successors[-self.values[successors] == self.values[index]]
+
+
+def winning_lines(rows: int, columns: int, k: int) -> np.ndarray:
+    # Function that lists the lines of k cells of a grid.
+    # Input: the size of the grid and the length of a winning line
+    # Output: a (lines, k) array of cell indexes, cell (row, column) being
+    # the index row * columns + column
+    lines = []
+    for row in range(rows):
+        for column in range(columns):
+            for row_step, column_step in DIRECTIONS:
+                last_row = row + row_step * (k - 1)
+                last_column = column + column_step * (k - 1)
+                if 0 <= last_row < rows and 0 <= last_column < columns:
+                    lines.append([
+                        (row + row_step * step) * columns
+                        + column + column_step * step
+                        for step in range(k)
+                    ])
+    return np.array(lines, dtype=np.intp).reshape(-1, k)
+
+
+def solve(rows: int = 3, columns: int = 3, k: int = 3) -> RetrogradeSolution:
+    # Function that solves every reachable position of an m,n,k-game.
+    # Input: the number of rows and columns of the grid, and the number of
+    # marks in a row that win
+    # Output: a RetrogradeSolution
+    cells = rows * columns
+    if rows < 1 or columns < 1 or cells > MAX_CELLS:
+        raise ValueError(f"The grid must have from 1 to {MAX_CELLS} cells")
+    if not 1 <= k <= max(rows, columns):
+        raise ValueError("k must be between 1 and the size of the grid")
+    powers = 3 ** np.arange(cells, dtype=np.int64)
+    lines = winning_lines(rows, columns, k)
+
+    # Forward: enumerate the layers, with the successors of each position.
+    layer_codes = [np.zeros(1, dtype=np.int64)]
+    layer_won = []
+    layer_counts = []
+    layer_successors = []
+    for marks in range(cells + 1):
+        codes = layer_codes[marks]
+        boards = (codes[:, None] // powers % 3).astype(np.int8)
+        # Only the player who just moved can have won.
+        won = np.zeros(len(codes), dtype=bool)
+        if marks:
+            last_mover = 1 if marks % 2 else 2
+            for line in lines:
+                won |= np.all(boards[:, line] == last_mover, axis=1)
+        layer_won.append(won)
+        counts = np.zeros(len(codes), dtype=np.int64)
+        layer_counts.append(counts)
+        if marks == cells:
+            break
+        mover = 1 if marks % 2 == 0 else 2
+        running = np.flatnonzero(~won)
+        parents, empty_cells = np.nonzero(boards[running] == 0)
+        children = codes[running][parents] + mover * powers[empty_cells]
+        next_codes, successors = np.unique(children, return_inverse=True)
+        counts[running] = np.bincount(parents, minlength=len(running))
+        layer_codes.append(next_codes)
+        layer_successors.append(successors.reshape(-1))
+
+    layers = np.zeros(len(layer_codes) + 1, dtype=np.int64)
+    layers[1:] = np.cumsum([len(codes) for codes in layer_codes])
+    indptr = np.zeros(layers[-1] + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.concatenate(layer_counts))
+    indices = np.concatenate(
+        [layers[marks + 1] + successors
+         for marks, successors in enumerate(layer_successors)]
+        + [np.zeros(0, dtype=np.int64)]
+    )
+
+    # Backward: assign the values from the last layer to the first.
+    values = np.zeros(layers[-1], dtype=np.int8)
+    for marks in reversed(range(len(layer_codes))):
+        start, stop = layers[marks], layers[marks + 1]
+        layer_values = values[start:stop]
+        layer_values[layer_won[marks]] = -1
+        running = np.flatnonzero(layer_counts[marks])
+        if not len(running):
+            continue
+        first, last = indptr[start], indptr[stop]
+        successor_values = values[indices[first:last]]
+        layer_values[running] = -np.minimum.reduceat(
+            successor_values, indptr[start + running] - first
+        )
+
+    return RetrogradeSolution(
+        rows, columns, k,
+        np.concatenate(layer_codes), layers, indptr, indices, values,
+    )
+
+
+def state_value(solution: RetrogradeSolution, game_state: GameState) -> int:
+    # Function that looks a tic-tac-toe position up in the solution of the
+    # 3,3,3-game.
+    # Input: the solution and a game state
+    # Output: the value of the state for its current player, like
+    # evaluate_score at the end of a perfect game
+    if (solution.rows, solution.columns, solution.k) != (3, 3, 3):
+        raise ValueError("The solution is not the one of tic-tac-toe")
+    grid = game_state.grid
+    first_bits, second_bits = grid.x_bits, grid.o_bits
+    if game_state.starting_mark == Mark.NAUGHT:
+        first_bits, second_bits = second_bits, first_bits
+    value = solution.value(TERNARY[first_bits] + 2 * TERNARY[second_bits])
+    if value is None:
+        raise ValueError("No game can reach this position")
+    return value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    solution = solve(args.rows, args.columns, args.k)
+    elapsed = time.perf_counter() - start
+    outcome = {1: "first player wins", 0: "draw", -1: "second player wins"}
+    print(f"{args.rows},{args.columns},{args.k}-game: "
+          f"{len(solution.codes)} positions, "
+          f"{len(solution.indices)} moves, solved in {elapsed:.3f} s")
+    print(f"perfect play: {outcome[int(solution.values[0])]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# tic_tac_toe/logic/symmetry.py
+
+# The grid has 8 symmetries: 4 rotations, each with or without a mirror.
+# Two grids that are the image of each other by a symmetry have the same
+# score and their best moves are images of each other, so a search can
+# solve only one of them.
+# A symmetry is stored as a permutation of the cell indexes: cell i of the
+# transformed grid is cell permutation[i] of the original grid.
+
+from typing import NamedTuple
+
+IDENTITY = (0, 1, 2, 3, 4, 5, 6, 7, 8)
+ROTATE_CLOCKWISE = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+MIRROR = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+
+
+def compose(
+    first: tuple[int, ...], second: tuple[int, ...]
+) -> tuple[int, ...]:
+    # Function that combines two symmetries.
+    # Input: two permutations
+    # Output: the permutation that applies first, then second
+    return tuple(first[index] for index in second)
+
+
+def _generate_symmetries() -> tuple[tuple[int, ...], ...]:
+    # Function that builds the 8 symmetries from a rotation and a mirror.
+    # The identity comes first, so that a grid that is already canonical
+    # keeps its orientation.
+    symmetries = []
+    rotation = IDENTITY
+    for _ in range(4):
+        symmetries.append(rotation)
+        rotation = compose(rotation, ROTATE_CLOCKWISE)
+    return tuple(symmetries) + tuple(
+        compose(symmetry, MIRROR) for symmetry in symmetries
+    )
+
+
+SYMMETRIES = _generate_symmetries()
+
+# INVERSES[s][i] is the cell of the transformed grid where the original
+# cell i ends up with the symmetry s.
+INVERSES = tuple(
+    tuple(symmetry.index(index) for index in range(9))
+    for symmetry in SYMMETRIES
+)
+
+# BIT_TRANSFORMS[s][bits] is the 9-bit board bits transformed by the
+# symmetry s. Precomputed for the 512 boards so that transforming a
+# bitboard is a lookup.
+BIT_TRANSFORMS = tuple(
+    tuple(
+        sum(1 << index for index in range(9) if bits >> symmetry[index] & 1)
+        for bits in range(512)
+    )
+    for symmetry in SYMMETRIES
+)
+
+
+def transform_cells(cells: str, symmetry: int) -> str:
+    # Input: a cells string and the index of a symmetry in SYMMETRIES
+    # Output: the transformed cells string
+    return "".join(cells[index] for index in SYMMETRIES[symmetry])
+
+
+def canonical_bits(first_bits: int, second_bits: int) -> tuple[int, int]:
+    # Function that finds the canonical version of a pair of bitboards, the
+    # one with the smallest packed value first_bits | second_bits << 9 among
+    # the 8 symmetric versions.
+    # Input: two 9-bit boards, usually the current player's and the other's
+    # Output: the packed canonical value and the index of the symmetry that
+    # gives it
+    best_key, best_symmetry = 1 << 18, 0
+    for symmetry, transform in enumerate(BIT_TRANSFORMS):
+        key = transform[first_bits] | transform[second_bits] << 9
+        if key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+class PositionKey(NamedTuple):
+    # The canonical key of a position, and the symmetry that turns the
+    # position into its canonical orientation. The key is the packed value
+    # returned by canonical_bits, for the bitboards of the player whose turn
+    # it is and of the other one (see GameState.position_key).
+    key: int
+    symmetry: int
+
+    def to_canonical(self, cell_index: int) -> int:
+        # Input: a cell index on the original grid
+        # Output: the same cell on the canonical grid
+        return INVERSES[self.symmetry][cell_index]
+
+    def from_canonical(self, cell_index: int) -> int:
+        # Input: a cell index on the canonical grid
+        # Output: the same cell on the original grid
+        return SYMMETRIES[self.symmetry][cell_index]
@@ -0,0 +1,192 @@
+# tic_tac_toe/logic/tablebase.py
+
+import argparse
+import mmap
+import struct
+from pathlib import Path
+from typing import NamedTuple
+
+from tic_tac_toe_ai_player.logic.models import (
+    CELLS_OF_MASK,
+    CODES_PER_MARK,
+    FULL_MASK,
+    WINNING_BOARDS,
+    GameState,
+    Mark,
+    Move,
+    position_code,
+)
+
+# A tablebase is a file with the perfect-play answer for every position of
+# the game, solved once and for all by backward induction. Looking a
+# position up is then a single read instead of a search.
+#
+# File format: a header (MAGIC), followed by one record per slot. The slot
+# of a position is its position code (see CODES_PER_MARK in models.py): the
+# base-3 number of its cells (cell i is the digit i, with 0 for an empty
+# cell, 1 for X and 2 for O), which gives 3^9 slots for each starting mark,
+# the slots of X-starting games first, then the ones of O-starting games.
+# Each record holds:
+# - the score for the player whose turn it is (1, 0 or -1), or UNREACHABLE
+#   for a slot that no game can reach,
+# - the number of moves until the end of the game with perfect play,
+# - the bitboard of the best cells (best score, then quickest win or
+#   slowest loss).
+
+MAGIC = b"TTTBASE1"
+SLOTS = CODES_PER_MARK
+RECORD = struct.Struct("<bBH")
+UNREACHABLE = -128
+
+
+class TablebaseEntry(NamedTuple):
+    # What the tablebase knows about a position.
+    score: int
+    distance: int
+    best_cells: tuple[int, ...]
+
+
+def solve_all() -> dict[int, tuple[int, int, int]]:
+    # Function that solves every position that can be reached from an empty
+    # grid, for both starting marks, by backward induction: positions are
+    # solved from the fullest grids to the empty one, so the positions after
+    # each move are always solved before the position itself.
+    # Input: None
+    # Output: a dictionary from slot to (score, distance, best cells bitboard)
+    positions = {}
+    for starting_mark in Mark:
+        to_visit = [(0, 0)]
+        while to_visit:
+            x_bits, o_bits = to_visit.pop()
+            slot = position_code(x_bits, o_bits, starting_mark)
+            if slot in positions:
+                continue
+            positions[slot] = (x_bits, o_bits, starting_mark)
+            if WINNING_BOARDS[x_bits] or WINNING_BOARDS[o_bits]:
+                continue
+            mover_is_x = _mover_is_x(x_bits, o_bits, starting_mark)
+            for index in CELLS_OF_MASK[FULL_MASK & ~(x_bits | o_bits)]:
+                if mover_is_x:
+                    to_visit.append((x_bits | 1 << index, o_bits))
+                else:
+                    to_visit.append((x_bits, o_bits | 1 << index))
+
+    def empty_count(slot: int) -> int:
+        x_bits, o_bits, _ = positions[slot]
+        return 9 - (x_bits | o_bits).bit_count()
+
+    solved: dict[int, tuple[int, int, int]] = {}
+    for slot in sorted(positions, key=empty_count):
+        x_bits, o_bits, starting_mark = positions[slot]
+        if WINNING_BOARDS[x_bits] or WINNING_BOARDS[o_bits]:
+            # The previous player just won.
+            solved[slot] = (-1, 0, 0)
+            continue
+        empty_bits = FULL_MASK & ~(x_bits | o_bits)
+        if not empty_bits:
+            solved[slot] = (0, 0, 0)
+            continue
+        mover_is_x = _mover_is_x(x_bits, o_bits, starting_mark)
+        best = None
+        best_cells = 0
+        for index in CELLS_OF_MASK[empty_bits]:
+            if mover_is_x:
+                child = position_code(
+                    x_bits | 1 << index, o_bits, starting_mark
+                )
+            else:
+                child = position_code(
+                    x_bits, o_bits | 1 << index, starting_mark
+                )
+            child_score, child_distance, _ = solved[child]
+            # Higher score first, then quicker wins and slower losses.
+            rank = (-child_score, child_score * (child_distance + 1))
+            if best is None or rank > best:
+                best, best_cells = rank, 1 << index
+            elif rank == best:
+                best_cells |= 1 << index
+        score, signed_distance = best
+        distance = abs(signed_distance) if score else empty_bits.bit_count()
+        solved[slot] = (score, distance, best_cells)
+    return solved
+
+
+def _mover_is_x(x_bits: int, o_bits: int, starting_mark: Mark) -> bool:
+    # Output: True if it is X's turn in this position
+    if x_bits.bit_count() == o_bits.bit_count():
+        return starting_mark == Mark.CROSS
+    return starting_mark != Mark.CROSS
+
+
+def build_tablebase(path: str | Path) -> None:
+    # Function that solves every position and writes the tablebase file.
+    # Input: the path of the file to write
+    # Output: None
+    solved = solve_all()
+    data = bytearray(MAGIC)
+    for slot in range(2 * SLOTS):
+        data += RECORD.pack(*solved.get(slot, (UNREACHABLE, 0, 0)))
+    Path(path).write_bytes(data)
+
+
+class Tablebase:
+    # A tablebase file, mapped in memory. The operating system only loads
+    # the pages that are read, and processes that map the same file share
+    # them. Lookups are O(1).
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        expected_size = len(MAGIC) + 2 * SLOTS * RECORD.size
+        if (
+            self._data[:len(MAGIC)] != MAGIC
+            or len(self._data) != expected_size
+        ):
+            self._data.close()
+            raise ValueError(f"{self.path} is not a tablebase file")
+
+    def close(self) -> None:
+        self._data.close()
+
+    def __enter__(self) -> "Tablebase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def lookup(self, game_state: GameState) -> TablebaseEntry | None:
+        # Input: a game state
+        # Output: its entry, or None if no game can reach that position
+        return self.lookup_code(game_state.to_code())
+
+    def lookup_code(self, code: int) -> TablebaseEntry | None:
+        # Input: a position code (see GameState.to_code)
+        # Output: the entry of the position, or None if no game can reach it
+        score, distance, best_bits = RECORD.unpack_from(
+            self._data, len(MAGIC) + code * RECORD.size
+        )
+        if score == UNREACHABLE:
+            return None
+        return TablebaseEntry(score, distance, CELLS_OF_MASK[best_bits])
+
+    def best_moves(self, game_state: GameState) -> list[Move] | None:
+        # Input: a game state
+        # Output: all the best moves of the position (an empty list if the
+        # game is over), or None if the position is not in the tablebase
+        entry = self.lookup(game_state)
+        if entry is None:
+            return None
+        return [game_state.make_move_to(index) for index in entry.best_cells]
+
+
+def main() -> None:
+    # Build step of the tablebase:
+    # python -m tic_tac_toe_ai_player.logic.tablebase tablebase.bin
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    args = parser.parse_args()
+    build_tablebase(args.path)
+
+
+if __name__ == "__main__":
+    main()
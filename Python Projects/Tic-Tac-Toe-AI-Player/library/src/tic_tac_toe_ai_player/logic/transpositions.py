@@ -0,0 +1,100 @@
+# tic_tac_toe/logic/transpositions.py
+
+import enum
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from tic_tac_toe_ai_player.logic.models import GameState
+from tic_tac_toe_ai_player.logic.symmetry import PositionKey
+
+
+class Bound(enum.Enum):
+    # What a stored score means. An alpha-beta search that was cut off does
+    # not know the exact score of a state, only a bound on it.
+    EXACT = "exact"
+    LOWER = "lower"  # the real score is at least the stored score
+    UPPER = "upper"  # the real score is at most the stored score
+
+
+class Entry(NamedTuple):
+    # A solved position: its score for the player whose turn it is, what
+    # kind of score it is, and the best cell found, in the canonical
+    # orientation (None if the state had no move).
+    score: int
+    bound: Bound
+    best_cell: int | None
+
+
+def position_key(game_state: GameState) -> PositionKey:
+    # Function that computes the key of a game state in the table. The score
+    # only depends on which cells belong to the player whose turn it is and
+    # which belong to the other one, so the key uses those two bitboards
+    # instead of X and O. It is also the same for the 8 symmetric versions
+    # of the grid (see GameState.canonical).
+    # Input: a game state
+    # Output: its PositionKey
+    return game_state.position_key()
+
+
+class TranspositionTable:
+    # A cache of solved positions shared by the searches that use it. The
+    # same position reached through different move orders, in another turn
+    # or by another player is only solved once.
+    # The table keeps at most capacity entries and evicts the least recently
+    # used one when it is full. hits and misses count the lookups.
+    # A lock protects the entries, since players searching in an executor
+    # (see ComputerPlayer.get_move_async) may share a table across threads.
+    def __init__(self, capacity: int = 100_000) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: int) -> Entry | None:
+        # Input: the key of a position
+        # Output: its entry, or None if the position is not in the table
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: int, entry: Entry) -> None:
+        # Function that stores an entry, and evicts the least recently used
+        # one if the table is over capacity.
+        # Input: the key of a position and its entry
+        # Output: None
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        # Function that empties the table and resets the counters.
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_shared_table: TranspositionTable | None = None
+
+
+def shared_table() -> TranspositionTable:
+    # Function that returns the table shared by every player of the process
+    # that asks for it. It is created on first use.
+    global _shared_table
+    if _shared_table is None:
+        _shared_table = TranspositionTable()
+    return _shared_table
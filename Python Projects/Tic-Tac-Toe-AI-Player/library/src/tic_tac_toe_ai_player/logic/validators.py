@@ -10,9 +10,40 @@ if TYPE_CHECKING:
 from tic_tac_toe_ai_player.logic.exceptions import InvalidGameState
 # from tic_tac_toe_ai_player.logic.models import Grid, Mark, GameState
 
+import enum
 import re
 
 
+class ValidationPolicy(enum.Enum):
+    # The validation policy of the library. Grids and game states built with
+    # their constructors (user input, deserialization, tests...) are always
+    # fully validated: those are the boundaries of the API. The policy only
+    # decides what happens to the states the engine derives itself, by
+    # playing a legal move on a state that is already valid:
+    # - FULL validates them again, like any other state.
+    # - TRUSTED (the default) skips the validators, since a legal move on a
+    #   valid state can only produce a valid state.
+    FULL = "full"
+    TRUSTED = "trusted"
+
+
+_validation_policy = ValidationPolicy.TRUSTED
+
+
+def get_validation_policy() -> ValidationPolicy:
+    # Output: the current validation policy of the library
+    return _validation_policy
+
+
+def set_validation_policy(policy: ValidationPolicy) -> None:
+    # Function that changes the validation policy of the library, for
+    # example to validate everything while debugging a new search.
+    # Input: the new policy
+    # Output: None
+    global _validation_policy
+    _validation_policy = ValidationPolicy(policy)
+
+
 def validate_grid(grid: Grid) -> None:
     # Function that validates the grid
     # Input: a grid